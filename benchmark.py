@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+# 性能基准：用合成的进程表与配置测量执法扫描、时段判断和配置读写的耗时、内存分配与吞吐量
+# 用法：python benchmark.py [--quick] [--save baseline.json] [--compare baseline.json]
+import os
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import platform
+import tempfile
+import itertools
+import statistics
+import tracemalloc
+import contextlib
+from datetime import datetime, timedelta
+
+FULL_SIZES = {'processes': [1000, 10000, 50000], 'blacklist': [10, 1000, 10000], 'items': [10, 500, 5000]}
+QUICK_SIZES = {'processes': [1000, 5000], 'blacklist': [10, 1000], 'items': [10, 500]}
+MATCH_RATE = 0.02
+ARRIVAL_RATE = 0.01
+DEFAULT_THRESHOLD = 0.25
+
+def create_fake_psutil():
+    # 只实现执法核心用到的 psutil 接口；进程表完全由基准控制，结果与本机进程无关
+    module = types.ModuleType('psutil')
+    table = {}
+
+    class Error(Exception):
+        pass
+
+    class NoSuchProcess(Error):
+        def __init__(self, pid=None, name=None, msg=None):
+            super().__init__(pid)
+            self.pid = pid
+
+    class AccessDenied(Error):
+        pass
+
+    class ZombieProcess(NoSuchProcess):
+        pass
+
+    class TimeoutExpired(Error):
+        pass
+
+    class Process:
+        def __init__(self, pid=None):
+            if pid not in table:
+                raise NoSuchProcess(pid)
+            self.pid = pid
+
+        def info(self):
+            try:
+                return table[self.pid]
+            except KeyError:
+                raise NoSuchProcess(self.pid)
+
+        def oneshot(self):
+            return contextlib.nullcontext()
+
+        def create_time(self):
+            return self.info()[0]
+
+        def name(self):
+            return self.info()[1]
+
+        def exe(self):
+            return self.info()[2]
+
+        def cmdline(self):
+            return [self.info()[2]]
+
+        def parent(self):
+            return None
+
+        def children(self, recursive=False):
+            return []
+
+        def kill(self):
+            self.info()
+            del table[self.pid]
+
+        terminate = kill
+
+        def wait(self, timeout=None):
+            return 0
+
+    def wait_procs(procs, timeout=None):
+        gone = [proc for proc in procs if proc.pid not in table]
+        return gone, [proc for proc in procs if proc.pid in table]
+
+    module.__dict__.update(
+        table=table, Error=Error, NoSuchProcess=NoSuchProcess, AccessDenied=AccessDenied,
+        ZombieProcess=ZombieProcess, TimeoutExpired=TimeoutExpired, Process=Process,
+        pids=lambda: list(table), pid_exists=lambda pid: pid in table, wait_procs=wait_procs,
+    )
+    return module
+
+FAKE_PSUTIL = create_fake_psutil()
+sys.modules['psutil'] = FAKE_PSUTIL
+import supervisor_core as core
+
+def make_process_table(count, blacklist, rng):
+    # 约 MATCH_RATE 的进程命中黑名单，其余为不命中的常见名称
+    hits = [entry['name'] for entry in blacklist if not entry['name'].startswith(core.REGEX_PREFIX)]
+    hits = [name.replace('*', 'x') for name in hits]
+    table = {}
+    for pid in range(1000, 1000 + count):
+        if hits and rng.random() < MATCH_RATE:
+            name = rng.choice(hits)
+        else:
+            name = f"worker{rng.randrange(count)}.exe"
+        table[pid] = (1700000000.0 + pid, name, f"C:\\Program Files\\App\\{name}")
+    return table
+
+def make_blacklist(count, rng):
+    # 80% 精确名称、15% 通配符、5% 正则，与实际配置的大致比例一致
+    entries = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.80:
+            name = f"app{i}.exe"
+        elif roll < 0.95:
+            name = f"*game{i}*.exe"
+        else:
+            name = f"re:^tool{i}_\\d+\\.exe$"
+        entries.append({'name': name, 'active': True})
+    return entries
+
+def make_items(count, blacklist, rng):
+    actions = ['提醒', '锁定', '关机', '仅启用黑名单（不弹窗）']
+    items = []
+    for i in range(count):
+        start = rng.randrange(0, 24 * 60 - 30)
+        end = min(start + rng.randrange(15, 180), 24 * 60 - 1)
+        enable_blacklist = rng.random() < 0.2
+        items.append({
+            'name': f"事项{i}",
+            'start': f"{start // 60:02d}:{start % 60:02d}",
+            'end': f"{end // 60:02d}:{end % 60:02d}",
+            'action': rng.choice(actions),
+            'active': rng.random() < 0.9,
+            'enable_blacklist': enable_blacklist,
+            'blacklist': rng.sample(blacklist, min(len(blacklist), 20)) if enable_blacklist else [],
+        })
+    return items
+
+def measure(run, units, repeat, setup=None):
+    # 耗时与内存分配分开测量，避免 tracemalloc 的开销计入耗时
+    samples = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        run(state)
+        samples.append(time.perf_counter() - started)
+    state = setup() if setup else None
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    run(state)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = statistics.median(samples)
+    samples.sort()
+    return {
+        'median_ms': median * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'min_ms': samples[0] * 1000,
+        'peak_kb': (peak - baseline) / 1024,
+        'retained_kb': (current - baseline) / 1024,
+        'throughput': units / median if median else 0.0,
+        'units': units,
+    }
+
+def create_engine(workdir, items, blacklist):
+    # 所有落盘路径都放在临时目录里，不碰真实的 CONFIG_DIR 与 hosts 文件；用完需调用 runtime.stop()
+    engine = core.EnforcementEngine(core.StubActions(echo=False),
+                                    config_path=os.path.join(workdir, 'config.json'),
+                                    state_path=os.path.join(workdir, 'state.json'),
+                                    metrics_path=os.path.join(workdir, 'metrics.json'),
+                                    usage_dir=os.path.join(workdir, 'usage'),
+                                    audit_dir=os.path.join(workdir, 'audit'),
+                                    hash_path=os.path.join(workdir, 'exe_hashes.json'),
+                                    hosts_path=os.path.join(workdir, 'hosts'))
+    engine.apply(items, blacklist)
+    return engine
+
+def bench_scan(workdir, process_count, blacklist_count, repeat, rng):
+    blacklist = make_blacklist(blacklist_count, rng)
+    base_table = make_process_table(process_count, blacklist, rng)
+    engine = create_engine(workdir, [], blacklist)
+    live = [engine.snapshot.matchers[None]]
+
+    def reset_table():
+        FAKE_PSUTIL.table.clear()
+        FAKE_PSUTIL.table.update(base_table)
+        engine.actions.log.clear()
+
+    def full_setup():
+        # 规则刚变化或表已过期：新扫描器，整表解析并逐个匹配
+        reset_table()
+        engine.scanner = core.ProcessScanner()
+        engine.enforced_matchers = []
+        engine.kill_retries = set()
+
+    def incremental_setup(push=False):
+        # 稳态：上一轮已扫描，本轮只有约 ARRIVAL_RATE 的新进程；轮询模式下还要逐个核对 pid 是否被复用
+        reset_table()
+        engine.process_events.push = push
+        engine.scanner = core.ProcessScanner()
+        engine.enforced_matchers = []
+        engine.kill_blacklist_processes(live, engine.collect_candidates(live))
+        engine.enforced_matchers = live
+        next_pid = 1000 + process_count
+        for pid in range(next_pid, next_pid + max(1, int(process_count * ARRIVAL_RATE))):
+            name = rng.choice(list(base_table.values()))[1]
+            FAKE_PSUTIL.table[pid] = (1700000000.0 + pid, name, name)
+        engine.scanner.refreshed_at -= 2
+
+    def scan(state):
+        engine.kill_blacklist_processes(live, engine.collect_candidates(live))
+
+    arrivals = max(1, int(process_count * ARRIVAL_RATE))
+
+    def event_setup():
+        incremental_setup()
+        engine.scanner.refresh(max_age=0)
+        return [pid for pid in FAKE_PSUTIL.table if pid >= 1000 + process_count]
+
+    def events(pids):
+        for pid in pids:
+            engine.enforce_new_process(pid)
+
+    suffix = f"p={process_count}/b={blacklist_count}"
+    try:
+        return {
+            f"scan_full/{suffix}": measure(scan, process_count, repeat, full_setup),
+            f"scan_incremental/{suffix}": measure(scan, process_count, repeat, incremental_setup),
+            f"scan_incremental_push/{suffix}": measure(scan, process_count, repeat,
+                                                       lambda: incremental_setup(push=True)),
+            f"process_events/{suffix}": measure(events, arrivals, repeat, event_setup),
+        }
+    finally:
+        engine.runtime.stop()
+
+def bench_matcher(blacklist_count, repeat, rng):
+    blacklist = make_blacklist(blacklist_count, rng)
+    names = [f"worker{i}.exe" for i in range(5000)] + [f"app{i}.exe" for i in range(0, blacklist_count, 7)]
+    matcher = core.BlacklistMatcher(blacklist)
+
+    def compile_rules(state):
+        core.BlacklistMatcher(blacklist)
+
+    def match(state):
+        for name in names:
+            matcher.matches(name)
+
+    return {
+        f"matcher_compile/b={blacklist_count}": measure(compile_rules, blacklist_count, repeat),
+        f"matcher_match/b={blacklist_count}": measure(match, len(names), repeat),
+    }
+
+def bench_schedule(workdir, item_count, repeat, rng):
+    items = make_items(item_count, make_blacklist(50, rng), rng)
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    moments = [midnight + timedelta(minutes=minute) for minute in range(0, 24 * 60, 5)]
+    schedule = core.ScheduleIndex(items)
+    # 界面持有自己的列表，按 item_key 对应引擎快照中的事项
+    engine = create_engine(workdir, items, [])
+
+    def build(state):
+        core.ScheduleIndex(items)
+
+    def restricted_checks(state):
+        # is_in_restricted_period 与监督动作判断的路径
+        for moment in moments:
+            schedule.is_restricted(moment)
+            schedule.seconds_until_boundary(moment)
+
+    def list_rows(state):
+        # refresh_supervision_list 中与 Tk 无关的部分：计算锁定集合并生成列表行
+        for moment in moments[::12]:
+            locked = engine.restricted_keys(moment)
+            [(item['active'], f"{item['name']} {item['start']}-{item['end']}",
+              core.ActionTracker.item_key(item) in locked)
+             for item in items]
+
+    try:
+        return {
+            f"schedule_build/i={item_count}": measure(build, item_count, repeat),
+            f"schedule_checks/i={item_count}": measure(restricted_checks, len(moments), repeat),
+            f"supervision_rows/i={item_count}": measure(list_rows, len(moments[::12]) * item_count, repeat),
+        }
+    finally:
+        engine.runtime.stop()
+
+def bench_config(workdir, item_count, blacklist_count, repeat, rng):
+    blacklist = make_blacklist(blacklist_count, rng)
+    items = make_items(item_count, blacklist, rng)
+    store = core.ConfigStore(os.path.join(workdir, f"config_{item_count}_{blacklist_count}.json"), readonly=False)
+
+    def save(state):
+        store.update(items=items, global_blacklist=blacklist, tomato_duration=1500)
+        store.flush()
+
+    def load(state):
+        store.load()
+
+    suffix = f"i={item_count}/b={blacklist_count}"
+    return {
+        f"config_save/{suffix}": measure(save, item_count + blacklist_count, repeat),
+        f"config_load/{suffix}": measure(load, item_count + blacklist_count, repeat),
+    }
+
+def run_benchmarks(sizes, repeat, seed):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for process_count, blacklist_count in itertools.product(sizes['processes'], sizes['blacklist']):
+            results.update(bench_scan(workdir, process_count, blacklist_count, repeat, random.Random(seed)))
+        for blacklist_count in sizes['blacklist']:
+            results.update(bench_matcher(blacklist_count, repeat, random.Random(seed)))
+        for item_count in sizes['items']:
+            results.update(bench_schedule(workdir, item_count, repeat, random.Random(seed)))
+        for item_count, blacklist_count in itertools.product(sizes['items'], sizes['blacklist']):
+            results.update(bench_config(workdir, item_count, blacklist_count, repeat, random.Random(seed)))
+    return results
+
+def print_results(results):
+    print(f"{'用例':<44}{'中位数(ms)':>12}{'P95(ms)':>12}{'吞吐量(/s)':>16}{'峰值分配(KB)':>16}{'驻留(KB)':>12}")
+    for name, result in results.items():
+        print(f"{name:<44}{result['median_ms']:>12.3f}{result['p95_ms']:>12.3f}"
+              f"{result['throughput']:>16,.0f}{result['peak_kb']:>16.1f}{result['retained_kb']:>12.1f}")
+
+def compare_results(results, baseline, threshold):
+    # 返回变慢超过阈值的用例；只比较两次都运行过的用例
+    regressions = []
+    print(f"\n与基线比较（阈值 {threshold:.0%}）：")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- 变慢"
+            regressions.append(name)
+        print(f"{name:<44}{before['median_ms']:>12.3f} -> {result['median_ms']:>10.3f} ms  ×{ratio:.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="执法核心性能基准")
+    parser.add_argument('--quick', action='store_true', help="只运行较小规模的用例")
+    parser.add_argument('--repeat', type=int, default=5, help="每个用例的重复次数")
+    parser.add_argument('--seed', type=int, default=1, help="生成数据的随机种子")
+    parser.add_argument('--save', metavar='FILE', help="把结果保存为基线")
+    parser.add_argument('--compare', metavar='FILE', help="与已保存的基线比较")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="判定变慢的相对阈值")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(QUICK_SIZES if args.quick else FULL_SIZES, max(1, args.repeat), args.seed)
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {args.save}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        if compare_results(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+# 规则模拟：用可快进的时钟和进程轨迹驱动执法核心，几秒内跑完一周，报告本应在何时执行哪些动作、终止哪些进程
+# 用法：python simulator.py [--config 配置文件] [--trace 轨迹.json] [--start 2026-10-19] [--days 7] [--respawn 600]
+#       python simulator.py --record 轨迹.json --duration 3600   录制本机真实进程轨迹
+import os
+import sys
+import json
+import time
+import heapq
+import asyncio
+import argparse
+import tempfile
+import itertools
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+import supervisor_core as core
+
+TRACE_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+DEFAULT_DAYS = 7
+DEFAULT_RESPAWN = 600
+RECORD_INTERVAL = 1.0
+WEEKDAY_NAMES = "一二三四五六日"
+
+class SimulatedClock:
+    # 与 SystemClock 接口一致，时间只在模拟调度器触发任务时前进
+    def __init__(self, start):
+        self.timestamp = start.timestamp()
+
+    def now(self):
+        return datetime.fromtimestamp(self.timestamp)
+
+    def time(self):
+        return self.timestamp
+
+    def monotonic(self):
+        return self.timestamp
+
+    def advance_to(self, timestamp):
+        self.timestamp = max(self.timestamp, timestamp)
+
+class SimulatedRuntime:
+    # 与 AsyncRuntime 接口一致：按模拟时钟依次触发到期任务，协程与阻塞调用都在当前线程同步执行
+    def __init__(self, clock):
+        self.clock = clock
+        self.heap = []
+        self.handles = {}
+        self.counter = itertools.count()
+
+    def start(self):
+        pass
+
+    def stop(self, timeout=None):
+        pass
+
+    def call_at(self, key, when, callback):
+        sequence = next(self.counter)
+        self.handles[key] = (sequence, callback)
+        heapq.heappush(self.heap, (when, sequence, key))
+
+    def call_later(self, key, delay, callback):
+        self.call_at(key, self.clock.monotonic() + delay, callback)
+
+    def cancel(self, key):
+        self.handles.pop(key, None)
+
+    async def run_blocking(self, function, *args):
+        return function(*args)
+
+    def submit_blocking(self, function, *args):
+        return function(*args)
+
+    def run_until(self, deadline):
+        while self.heap and self.heap[0][0] <= deadline:
+            when, sequence, key = heapq.heappop(self.heap)
+            handle = self.handles.get(key)
+            if handle is None or handle[0] != sequence:
+                continue
+            del self.handles[key]
+            self.clock.advance_to(when)
+            result = handle[1]()
+            if asyncio.iscoroutine(result):
+                # 模拟中的 run_blocking 不会挂起，协程一次 send 即可跑完
+                try:
+                    result.send(None)
+                except StopIteration:
+                    continue
+                result.close()
+                raise RuntimeError(f"模拟任务 {key} 挂起，模拟模式不支持真正的异步等待")
+        self.clock.advance_to(deadline)
+
+class TraceEventSource(core.ProcessEventSource):
+    # 轨迹中的进程启动由模拟调度器按时间推送，相当于实时事件源
+    name = 'trace'
+    push = True
+
+    def start(self, on_start, on_overflow=None, on_failed=None):
+        self.on_start = on_start
+        self.running = True
+
+class TraceProcess:
+    # 只实现 ProcessTreeKiller.find_root 用到的接口
+    def __init__(self, scanner, pid):
+        self.scanner = scanner
+        self.pid = pid
+
+    def name(self):
+        return self.scanner.records[self.pid]['name']
+
+    def parent(self):
+        ppid = self.scanner.records[self.pid]['ppid']
+        if ppid is None or not self.scanner.alive(ppid):
+            return None
+        return TraceProcess(self.scanner, ppid)
+
+class TraceScanner(core.ProcessScanner):
+    # 用进程轨迹代替 psutil：按模拟时钟判断进程是否存活；被终止的进程按 respawn 秒数后重新启动
+    def __init__(self, clock, on_spawn):
+        super().__init__(clock)
+        self.records = {}
+        self.on_spawn = on_spawn
+        self.pids = itertools.count(10000)
+
+    def add(self, name, start, end=None, exe=None, pid=None, ppid=None, respawn=None):
+        if pid is None:
+            pid = next(self.pids)
+            while pid in self.records:
+                pid = next(self.pids)
+        self.records[pid] = {'name': name, 'start': start, 'end': end, 'exe': exe, 'ppid': ppid, 'respawn': respawn}
+        self.on_spawn(pid, start)
+        return pid
+
+    def alive(self, pid):
+        record = self.records.get(pid)
+        now = self.clock.time()
+        return record is not None and record['start'] <= now and (record['end'] is None or now < record['end'])
+
+    def list_pids(self):
+        return [pid for pid in self.records if self.alive(pid)]
+
+    def create_time(self, pid):
+        return self.records[pid]['start'] if self.alive(pid) else None
+
+    def resolve(self, pid):
+        if not self.alive(pid):
+            return None
+        record = self.records[pid]
+        return core.ProcessEntry(pid, record['start'], record['name'], record['exe'])
+
+    def process(self, entry):
+        if not self.alive(entry.pid):
+            raise core.psutil.NoSuchProcess(entry.pid)
+        return TraceProcess(self, entry.pid)
+
+    def terminate(self, root):
+        now = self.clock.time()
+        tree = [root]
+        for pid in tree:
+            tree.extend(child for child, record in self.records.items()
+                        if record['ppid'] == pid and child not in tree and self.alive(child))
+        for pid in tree:
+            record = self.records[pid]
+            if record['respawn'] is not None:
+                self.add(record['name'], now + record['respawn'], record['end'], record['exe'],
+                         respawn=record['respawn'])
+            record['end'] = now
+        return tree
+
+class TraceTreeKiller(core.ProcessTreeKiller):
+    def __init__(self, scanner):
+        super().__init__()
+        self.scanner = scanner
+
+    def terminate(self, roots):
+        return {root.pid: self.scanner.terminate(root.pid) for root in roots}, set()
+
+def parse_trace_time(value):
+    for fmt in TRACE_TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"无法解析轨迹时间: {value}")
+
+def load_trace(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    return [{
+        'name': record['name'],
+        'start': parse_trace_time(record['start']),
+        'end': parse_trace_time(record['end']) if record.get('end') else None,
+        'exe': record.get('exe'),
+        'pid': record.get('pid'),
+        'ppid': record.get('ppid'),
+        'respawn': record.get('respawn'),
+    } for record in records]
+
+def synthetic_trace(items, global_blacklist, start, respawn):
+    # 没有轨迹时：黑名单中每个精确进程名从模拟开始一直运行，被终止后 respawn 秒再次打开
+    names = []
+    for entries in [global_blacklist] + [item.get('blacklist', []) for item in items if item.get('enable_blacklist')]:
+        for entry in entries:
+            name = entry.get('name', '').strip()
+            if (entry.get('active') and name and name.lower() not in names and
+                    not any(char in name for char in core.WILDCARD_CHARS) and ':' not in name):
+                names.append(name.lower())
+    return [{'name': name, 'start': start.timestamp(), 'end': None, 'exe': None,
+             'pid': None, 'ppid': None, 'respawn': respawn} for name in names]
+
+def restricted_windows(engine, start, end):
+    # 沿时段边界前进，找出界面处于受限状态（执行期或准备期）的区间
+    windows = []
+    moment = start
+    opened = None
+    while moment < end:
+        restricted = engine.is_restricted(moment)
+        if restricted and opened is None:
+            opened = moment
+        elif not restricted and opened is not None:
+            windows.append((opened, moment))
+            opened = None
+        offset = engine.snapshot.schedule.seconds_until_boundary(moment)
+        if offset is None:
+            break
+        moment += timedelta(seconds=max(offset, 1))
+    if opened is not None:
+        windows.append((opened, end))
+    return windows
+
+def simulate(items, global_blacklist, trace, start, days):
+    clock = SimulatedClock(start)
+    runtime = SimulatedRuntime(clock)
+    with tempfile.TemporaryDirectory(prefix='supervisor_simulate_') as workdir:
+        actions = core.StubActions(echo=False, clock=clock)
+        engine = core.EnforcementEngine(actions,
+                                        config_path=os.path.join(workdir, 'config.json'),
+                                        state_path=os.path.join(workdir, 'state.json'),
+                                        metrics_path=os.path.join(workdir, 'metrics.json'),
+                                        usage_dir=os.path.join(workdir, 'usage'),
+                                        audit_dir=os.path.join(workdir, 'audit'),
+                                        hash_path=os.path.join(workdir, 'exe_hashes.json'),
+                                        hosts_path=os.path.join(workdir, 'hosts'),
+                                        clock=clock, runtime=runtime)
+
+        def on_spawn(pid, when):
+            runtime.call_at(f"spawn:{pid}", when, lambda: engine.on_process_started(pid))
+
+        engine.scanner = TraceScanner(clock, on_spawn)
+        engine.tree_killer = TraceTreeKiller(engine.scanner)
+        engine.process_events = TraceEventSource()
+        engine.process_events.start(engine.on_process_started)
+        engine.session_state = lambda: (False, 0)
+        # 模拟中没有重启，不按本机开机时间判断强制动作是否需要重新执行
+        engine.tracker.session_start = float('-inf')
+        # 模拟时保留全部节奏决策用于汇总
+        engine.cadence.decisions = deque()
+        for record in trace:
+            engine.scanner.add(**record)
+        engine.apply(items, global_blacklist)
+        end = start + timedelta(days=days)
+        started = time.perf_counter()
+        runtime.run_until(end.timestamp())
+        elapsed = time.perf_counter() - started
+        # 先写完各存储的延迟写盘，临时目录删除后不再有定时器写入
+        engine.flush()
+        return actions.log, restricted_windows(engine, start, end), elapsed, Counter(
+            decision.reason for decision in engine.cadence.decisions)
+
+def format_moment(moment):
+    return f"周{WEEKDAY_NAMES[moment.weekday()]} {moment:%Y-%m-%d %H:%M:%S}"
+
+def print_report(log, windows, elapsed, days, cadence):
+    print(f"模拟 {days} 天完成，用时 {elapsed:.2f} 秒")
+    print("\n受限时段（执行期或准备期，界面禁止修改）：")
+    for opened, closed in windows:
+        print(f"  {format_moment(opened)} -> {closed:%Y-%m-%d %H:%M:%S}")
+    if not windows:
+        print("  无")
+    print("\n动作与终止记录：")
+    for moment, action, detail in log:
+        print(f"  {format_moment(moment)}  {action:<6} {detail}")
+    if not log:
+        print("  无")
+    print("\n汇总：")
+    for (day, action), count in sorted(Counter((moment.date(), action) for moment, action, _ in log).items()):
+        print(f"  {day} 周{WEEKDAY_NAMES[day.weekday()]}  {action:<6} {count} 次")
+    print("\n扫描节奏决策（按原因）：")
+    for reason, count in cadence.most_common():
+        print(f"  {reason:<13} {count} 次")
+
+def record_trace(path, duration, interval=RECORD_INTERVAL):
+    # 录制本机真实进程轨迹，供模拟回放
+    scanner = core.ProcessScanner()
+    seen = {}
+    deadline = time.time() + duration
+    while True:
+        scanner.refresh()
+        now = time.time()
+        current = {entry.pid: entry for entry in scanner.snapshot()}
+        for pid, entry in current.items():
+            if pid not in seen and entry.name:
+                try:
+                    ppid = core.psutil.Process(pid).ppid()
+                except core.psutil.Error:
+                    ppid = None
+                seen[pid] = {'pid': pid, 'ppid': ppid, 'name': entry.name, 'exe': entry.exe,
+                             'start': datetime.fromtimestamp(entry.create_time).strftime(TRACE_TIME_FORMATS[0]),
+                             'end': None}
+        for pid, record in seen.items():
+            if record['end'] is None and pid not in current:
+                record['end'] = datetime.fromtimestamp(now).strftime(TRACE_TIME_FORMATS[0])
+        if now >= deadline:
+            break
+        time.sleep(interval)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(list(seen.values()), f, ensure_ascii=False, indent=2)
+    print(f"已录制 {len(seen)} 个进程到 {path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="规则模拟与进程轨迹回放")
+    parser.add_argument('--config', default=core.CONFIG_FILE, help="要模拟的配置文件")
+    parser.add_argument('--trace', metavar='FILE', help="进程轨迹；不指定则按黑名单合成")
+    parser.add_argument('--start', help="模拟起始日期（YYYY-MM-DD），默认下周一")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="模拟天数")
+    parser.add_argument('--respawn', type=int, default=DEFAULT_RESPAWN,
+                        help="合成轨迹中进程被终止后重新打开的秒数")
+    parser.add_argument('--record', metavar='FILE', help="录制本机进程轨迹到文件后退出")
+    parser.add_argument('--duration', type=int, default=3600, help="录制时长（秒）")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_trace(args.record, args.duration)
+        return 0
+    with open(args.config, 'r') as f:
+        data = json.load(f)
+    items, global_blacklist = data.get('items', []), data.get('global_blacklist', [])
+    if args.start:
+        start = datetime.strptime(args.start, "%Y-%m-%d")
+    else:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today + timedelta(days=7 - today.weekday())
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        trace = synthetic_trace(items, global_blacklist, start, args.respawn)
+    log, windows, elapsed, cadence = simulate(items, global_blacklist, trace, start, max(1, args.days))
+    print_report(log, windows, elapsed, max(1, args.days), cadence)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2827 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import sys
+import copy
+import json
+import fnmatch
+import types
+import hashlib
+import time
+import errno
+import contextlib
+import struct
+import select
+import ctypes
+import threading
+import queue
+import psutil
+import subprocess
+import tempfile
+from array import array
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+CONFIG_DIR = os.path.join(os.getenv('APPDATA') or os.path.join(os.path.expanduser('~'), '.config'), 'SupervisorApp')
+CONFIG_FILE = os.path.join(CONFIG_DIR, 'supervisor_config.json')
+GRACE_PERIOD = 30
+ACTION_STATE_FILE = os.path.join(CONFIG_DIR, 'action_state.json')
+TOMATO_HISTORY_FILE = os.path.join(CONFIG_DIR, 'tomato_history.json')
+METRICS_FILE = os.path.join(CONFIG_DIR, 'metrics.json')
+USAGE_DIR = os.path.join(CONFIG_DIR, 'usage')
+AUDIT_DIR = os.path.join(CONFIG_DIR, 'audit')
+EXE_HASH_FILE = os.path.join(CONFIG_DIR, 'exe_hashes.json')
+HOSTS_FILE = os.getenv('SUPERVISOR_HOSTS_FILE') or (
+    os.path.join(os.getenv('SystemRoot', r'C:\Windows'), 'System32', 'drivers', 'etc', 'hosts')
+    if sys.platform == 'win32' else '/etc/hosts')
+TIME_FORMAT = "%H:%M"
+DAY_SECONDS = 24 * 3600
+ENFORCEMENT_INTERVAL = 5
+SCHEDULER_MAX_SLEEP = 300
+RUNTIME_WORKERS = 4
+CONFIG_FLUSH_DELAY = 0.5
+TOMATO_RESYNC = 30
+TOMATO_HISTORY_LIMIT = 200
+TOMATO_LONG_BREAK_EVERY = 4
+PROCESS_TABLE_TTL = 60
+KILL_WORKERS = 4
+KILL_GRACE = 1.5
+KILL_TIMEOUT = 1.0
+SCAN_MAX_AGE = ENFORCEMENT_INTERVAL
+ARRIVAL_HISTORY = 16
+NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+GUARDIAN_MIN_BACKOFF = 1
+GUARDIAN_MAX_BACKOFF = 60
+GUARDIAN_STABLE_RUNTIME = 30
+GUARDIAN_CRASH_WINDOW = 120
+GUARDIAN_CRASH_LIMIT = 5
+EVENT_SOURCE_START_TIMEOUT = 5
+EVENT_SOURCE_STOP_TIMEOUT = 3
+USAGE_SAMPLE_INTERVAL = 15
+AUDIT_MAX_BYTES = 4 * 1024 * 1024
+AUDIT_MAX_FILES = 100
+AUDIT_INDEX_BYTES = 32 * 1024
+AUDIT_QUEUE_LIMIT = 10000
+AUDIT_BATCH = 512
+AUDIT_PAGE_SIZE = 100
+METRICS_PORT = 9477
+METRICS_DUMP_INTERVAL = 60
+CADENCE_FAST_INTERVAL = 1
+CADENCE_START_WINDOW = 180
+CADENCE_KILL_WINDOW = 120
+CADENCE_QUIET_AFTER = 600
+CADENCE_MAX_INTERVAL = 60
+CADENCE_IDLE_AFTER = 300
+CADENCE_IDLE_INTERVAL = 30
+CADENCE_LOCKED_INTERVAL = 60
+CADENCE_HISTORY = 500
+CADENCE_EXPORT_LIMIT = 100
+DESKTOP_SWITCHDESKTOP = 0x0100
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+SPAWN_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300)
+REGEX_PREFIX = "re:"
+WILDCARD_CHARS = "*?["
+REGEX_META_CHARS = ".^$*+?{}[]\\|()"
+MATCHER_GRAM = 3
+MATCHER_INDEX_MIN = 16
+HASH_PREFIX = "sha256:"
+PUBLISHER_PREFIX = "publisher:"
+HASH_WORKERS = 2
+HASH_CHUNK = 1024 * 1024
+HASH_CACHE_FLUSH_DELAY = 5
+HOSTS_BEGIN = "# >>> SupervisorApp blocklist >>>"
+HOSTS_END = "# <<< SupervisorApp blocklist <<<"
+HOSTS_ADDRESS = "0.0.0.0"
+HOSTS_NAMES_PER_LINE = 8
+DOMAIN_PATTERN = re.compile(r"(?:(?!-)[a-z0-9-]{1,63}(?<!-)\.)+(?!-)[a-z0-9-]{1,63}(?<!-)\Z")
+
+class StartupTimer:
+    # 记录启动各阶段相对进程创建的时间点与耗时，--startup-report 时输出类似 -X importtime 的明细
+    def __init__(self):
+        try:
+            self.origin = psutil.Process().create_time()
+        except psutil.Error:
+            self.origin = time.time()
+        self.records = []
+
+    @contextlib.contextmanager
+    def measure(self, label):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.records.append((label, start - self.origin, time.time() - start))
+
+    def mark(self, label):
+        self.records.append((label, time.time() - self.origin, 0.0))
+
+    def report(self):
+        lines = ["启动耗时报告（相对进程创建）", f"{'时间点(ms)':>12} | {'耗时(ms)':>10} | 阶段"]
+        for label, offset, duration in self.records:
+            lines.append(f"{offset * 1000:>12.1f} | {duration * 1000:>10.1f} | {label}")
+        return "\n".join(lines)
+
+STARTUP_TIMER = StartupTimer()
+STARTUP_TIMER.mark("基础模块导入完成")
+
+class SystemClock:
+    # 时钟抽象：执法逻辑只通过它取时间，模拟模式注入可快进的时钟
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+SYSTEM_CLOCK = SystemClock()
+
+def parse_clock(value):
+    parsed = datetime.strptime(value, TIME_FORMAT).time()
+    return parsed.hour * 3600 + parsed.minute * 60
+
+def seconds_of_day(moment):
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+class ScheduleIndex:
+    # 将监督时段预编译为按秒排序的区间表，每个区间直接保存当时生效的事项
+    def __init__(self, items):
+        self.spans = {}
+        active_spans = []
+        restricted_spans = []
+        for order, item in enumerate(items):
+            if not item.get('active'):
+                continue
+            try:
+                start = parse_clock(item['start'])
+                end = parse_clock(item['end'])
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"监督时段时间无效，已忽略: {item.get('name')} ({e})")
+                continue
+            if start > end:
+                continue
+            self.spans[id(item)] = (item, start, end)
+            active_spans.append((start, end + 1, order, item))
+            early_start = start - GRACE_PERIOD * 60
+            if early_start >= 0:
+                restricted_spans.append((early_start, end + 1, order, item))
+            else:
+                # 准备期跨越午夜时拆成两段
+                restricted_spans.append((0, end + 1, order, item))
+                restricted_spans.append((early_start + DAY_SECONDS, DAY_SECONDS, order, item))
+        self.active_bounds, self.active_segments = self.build_segments(active_spans)
+        self.restricted_bounds, self.restricted_segments = self.build_segments(restricted_spans)
+        self.boundaries = sorted({point for span in active_spans + restricted_spans
+                                  for point in span[:2] if point < DAY_SECONDS})
+
+    @staticmethod
+    def build_segments(spans):
+        events = {}
+        for start, end, order, item in spans:
+            events.setdefault(start, []).append((1, order, item))
+            events.setdefault(end, []).append((-1, order, item))
+        bounds = [0]
+        segments = [()]
+        live = {}
+        counts = {}
+        for point in sorted(events):
+            for delta, order, item in events[point]:
+                counts[order] = counts.get(order, 0) + delta
+                if counts[order] > 0:
+                    live[order] = item
+                else:
+                    live.pop(order, None)
+            snapshot = tuple(live[order] for order in sorted(live))
+            if point == bounds[-1]:
+                segments[-1] = snapshot
+            else:
+                bounds.append(point)
+                segments.append(snapshot)
+        return bounds, segments
+
+    @staticmethod
+    def lookup(bounds, segments, moment):
+        return segments[bisect_right(bounds, seconds_of_day(moment)) - 1]
+
+    def active_items(self, moment):
+        return self.lookup(self.active_bounds, self.active_segments, moment)
+
+    def restricted_items(self, moment):
+        return self.lookup(self.restricted_bounds, self.restricted_segments, moment)
+
+    def is_restricted(self, moment):
+        return bool(self.restricted_items(moment))
+
+    def is_item_restricted(self, item, moment):
+        return any(live is item for live in self.restricted_items(moment))
+
+    def phase(self, item, moment):
+        span = self.spans.get(id(item))
+        if span is None:
+            return None
+        if any(live is item for live in self.active_items(moment)):
+            return 'active'
+        if self.is_item_restricted(item, moment):
+            return 'grace'
+        return 'ended' if seconds_of_day(moment) > span[2] else 'pending'
+
+    def seconds_until_boundary(self, moment):
+        if not self.boundaries:
+            return None
+        position = bisect_right(self.boundaries, seconds_of_day(moment))
+        if position < len(self.boundaries):
+            boundary = self.boundaries[position]
+        else:
+            boundary = self.boundaries[0] + DAY_SECONDS
+        return boundary - seconds_of_day(moment) - moment.microsecond / 1e6
+
+class BlacklistMatcher:
+    # 黑名单编译结果：精确名称走小写集合查找；通配符与正则按必含的三字符片段分桶，
+    # 名称只核对自身片段所在桶中的少数模式，取不到片段的模式合并成一个正则；
+    # 带内联全局标志或分组（可能含反向引用）的正则无法安全合并，单独编译
+    def __init__(self, entries):
+        exact = set()
+        patterns = []
+        self.rules = []
+        self.separate = []
+        self.hashes = {}
+        self.publishers = {}
+        for entry in entries:
+            if not entry.get('active'):
+                continue
+            name = entry.get('name', '').strip()
+            lowered = name.lower()
+            if lowered.startswith(HASH_PREFIX):
+                digest = lowered[len(HASH_PREFIX):].strip()
+                if not re.fullmatch(r"[0-9a-f]{64}", digest):
+                    print(f"黑名单摘要无效，已忽略: {name}")
+                    continue
+                self.hashes[digest] = name
+            elif lowered.startswith(PUBLISHER_PREFIX):
+                publisher = lowered[len(PUBLISHER_PREFIX):].strip()
+                if publisher:
+                    self.publishers[publisher] = name
+            elif name[:len(REGEX_PREFIX)].lower() == REGEX_PREFIX:
+                pattern = name[len(REGEX_PREFIX):]
+                try:
+                    compiled = re.compile(pattern, re.IGNORECASE)
+                except re.error as e:
+                    print(f"黑名单正则无效，已忽略: {name} ({e})")
+                    continue
+                self.rules.append((name, pattern))
+                try:
+                    mergeable = not compiled.groups and re.compile(rf"(?:{pattern})\Z", re.IGNORECASE)
+                except re.error:
+                    mergeable = False
+                if mergeable:
+                    patterns.append((self.regex_literals(pattern), rf"(?:{pattern})\Z"))
+                else:
+                    self.separate.append(compiled)
+            elif any(char in name for char in WILDCARD_CHARS):
+                patterns.append((self.glob_literals(lowered), fnmatch.translate(lowered)))
+                self.rules.append((name, patterns[-1][1]))
+            elif name:
+                exact.add(lowered)
+        self.exact = frozenset(exact)
+        self.grams, self.pattern = self.index_patterns(patterns)
+
+    @staticmethod
+    def index_patterns(patterns):
+        # 每条模式取一个它必含、且在所有模式中最少见的片段作为桶键，避免 ".exe" 之类的公共片段聚成大桶；
+        # 模式很少时逐个片段查桶反而比直接试合并正则慢，不建索引
+        if len(patterns) < MATCHER_INDEX_MIN:
+            return {}, BlacklistMatcher.combine(pattern for _, pattern in patterns) if patterns else None
+        options = [{literal[i:i + MATCHER_GRAM].lower() for literal in literals
+                    for i in range(len(literal) - MATCHER_GRAM + 1)} for literals, _ in patterns]
+        counts = Counter(gram for grams in options for gram in grams)
+        buckets = {}
+        rest = []
+        for grams, (_, pattern) in zip(options, patterns):
+            if grams:
+                buckets.setdefault(min(grams, key=lambda gram: (counts[gram], gram)), []).append(pattern)
+            else:
+                rest.append(pattern)
+        combine = BlacklistMatcher.combine
+        return {gram: combine(group) for gram, group in buckets.items()}, combine(rest) if rest else None
+
+    @staticmethod
+    def combine(patterns):
+        return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+    @staticmethod
+    def glob_literals(pattern):
+        # 通配符之间的字面量片段，与 fnmatch 的解析一致：没有闭合的 [ 按普通字符处理
+        literals = ['']
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            i += 1
+            if char == '[':
+                j = i + 1 if pattern[i:i + 1] == '!' else i
+                j = pattern.find(']', j + 1 if pattern[j:j + 1] == ']' else j)
+                if j >= 0:
+                    literals.append('')
+                    i = j + 1
+                    continue
+            if char in '*?':
+                literals.append('')
+            else:
+                literals[-1] += char
+        return [literal for literal in literals if literal]
+
+    @staticmethod
+    def regex_literals(pattern):
+        # 保守地取出正则中必定出现的字面量：含 | 时放弃；分组、字符类、转义类和带量词的字符都视为断开
+        if '|' in pattern:
+            return []
+        literals = ['']
+        i = 0
+        skip_word = False
+        while i < len(pattern):
+            char = pattern[i]
+            i += 1
+            if char == '\\' and i < len(pattern):
+                escaped = pattern[i]
+                i += 1
+                if escaped.isascii() and not escaped.isalnum():
+                    char = escaped
+                else:
+                    # \d、\x41、\N{...} 等：连同紧跟的字母数字一起跳过
+                    literals.append('')
+                    skip_word = True
+                    continue
+            elif skip_word and char.isalnum():
+                continue
+            elif char in REGEX_META_CHARS:
+                skip_word = False
+                literals.append('')
+                closing = {'(': ')', '[': ']', '{': '}'}.get(char)
+                if closing is not None:
+                    i = BlacklistMatcher.skip_group(pattern, i, char, closing)
+                continue
+            skip_word = False
+            if pattern[i:i + 1] and pattern[i] in '?*{':
+                literals.append('')
+            else:
+                literals[-1] += char
+        return [literal for literal in literals if literal]
+
+    @staticmethod
+    def skip_group(pattern, i, opening, closing):
+        # 从 opening 之后跳到配对的 closing 之后；字符类开头的 ] 是普通字符，类内不计嵌套
+        if opening == '[':
+            i += pattern[i:i + 1] == '^'
+            i += pattern[i:i + 1] == ']'
+        depth = 1
+        while i < len(pattern):
+            char = pattern[i]
+            i += 2 if char == '\\' else 1
+            if char == closing:
+                depth -= 1
+                if not depth:
+                    break
+            elif opening != '[':
+                if char == '[':
+                    i = BlacklistMatcher.skip_group(pattern, i, '[', ']')
+                elif char == opening:
+                    depth += 1
+        return i
+
+    def __bool__(self):
+        return (bool(self.exact) or bool(self.grams) or self.pattern is not None or bool(self.separate) or
+                self.by_identity)
+
+    @property
+    def by_identity(self):
+        return bool(self.hashes) or bool(self.publishers)
+
+    def matches(self, name):
+        name = name.lower()
+        if name in self.exact:
+            return True
+        grams = self.grams
+        if grams:
+            for i in range(len(name) - MATCHER_GRAM + 1):
+                pattern = grams.get(name[i:i + MATCHER_GRAM])
+                if pattern is not None and pattern.match(name) is not None:
+                    return True
+        return ((self.pattern is not None and self.pattern.match(name) is not None) or
+                any(pattern.fullmatch(name) for pattern in self.separate))
+
+    def rule_for(self, name):
+        # 只在命中后调用，用于按规则统计；逐条核对合并前的模式
+        name = name.lower()
+        if name in self.exact:
+            return name
+        for rule, pattern in self.rules:
+            if re.fullmatch(pattern, name, re.IGNORECASE):
+                return rule
+        return None
+
+    def identity_rule(self, identity):
+        # 按可执行文件内容或发行者匹配，改名无法绕过
+        rule = self.hashes.get(identity.digest)
+        if rule is None and identity.publisher:
+            rule = self.publishers.get(identity.publisher.lower())
+        return rule
+
+ProcessEntry = namedtuple('ProcessEntry', ['pid', 'create_time', 'name', 'exe'])
+
+class ProcessScanner:
+    # 全局共享的进程快照：每个间隔最多扫描一次，缓存 pid -> (创建时间, 名称, 路径)，
+    # 并按名称、命令行参数建立索引；命令行只在首次被查询时读取
+    def __init__(self, clock=SYSTEM_CLOCK):
+        self.clock = clock
+        self.lock = threading.RLock()
+        self.refreshed_at = None
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        self.entries = {}
+        self.name_index = {}
+        self.cmdlines = {}
+        self.token_index = {}
+        self.arrivals = {}
+
+    def refresh(self, max_age=0, verify=False):
+        # verify 时逐个核对存活 pid 的创建时间以发现 pid 复用，代价接近整表扫描，只在轮询模式下使用；
+        # 推送模式下新进程由 track 重新解析，终止前 process 也会再核对一次
+        with self.lock:
+            now = self.clock.monotonic()
+            if self.refreshed_at is not None:
+                age = now - self.refreshed_at
+                if age <= max_age:
+                    return self.generation
+                if age > PROCESS_TABLE_TTL:
+                    # 长时间未刷新时 pid 可能已被复用，整表重建
+                    self.clear()
+            self.refreshed_at = now
+            self.generation += 1
+            current = set(self.list_pids())
+            for pid in self.entries.keys() - current:
+                self.forget(pid)
+            if verify:
+                for pid in current & self.entries.keys():
+                    # pid 可能在两次扫描之间被新进程复用，创建时间不同即按新进程重新解析
+                    if self.create_time(pid) != self.entries[pid].create_time:
+                        self.forget(pid)
+            arrived = []
+            for pid in current - self.entries.keys():
+                entry = self.resolve(pid)
+                if entry is not None:
+                    self.remember(entry)
+                    arrived.append(pid)
+            self.arrivals[self.generation] = arrived
+            self.arrivals.pop(self.generation - ARRIVAL_HISTORY, None)
+            return self.generation
+
+    def arrivals_since(self, generation):
+        # 返回 None 表示调用方落后太多，需要自行核对整张表
+        with self.lock:
+            if generation is None or self.generation - generation >= ARRIVAL_HISTORY:
+                return None
+            pids = [pid for gen in range(generation + 1, self.generation + 1)
+                    for pid in self.arrivals.get(gen, ())]
+            return [self.entries[pid] for pid in pids if pid in self.entries]
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.entries.values())
+
+    def get(self, pid):
+        return self.entries.get(pid)
+
+    def is_alive(self, pid):
+        return pid in self.entries
+
+    def pids_named(self, name):
+        with self.lock:
+            return set(self.name_index.get(name.lower(), ()))
+
+    def pids_with_token(self, token):
+        with self.lock:
+            for pid in self.entries.keys() - self.cmdlines.keys():
+                self.index_cmdline(pid)
+            return set(self.token_index.get(token, ()))
+
+    def cmdline(self, pid):
+        with self.lock:
+            if pid in self.entries and pid not in self.cmdlines:
+                self.index_cmdline(pid)
+            return self.cmdlines.get(pid, ())
+
+    def index_cmdline(self, pid):
+        try:
+            cmdline = tuple(psutil.Process(pid).cmdline() or ())
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, OSError):
+            cmdline = ()
+        self.cmdlines[pid] = cmdline
+        for token in set(cmdline):
+            self.token_index.setdefault(token, set()).add(pid)
+
+    def remember(self, entry):
+        if entry.pid in self.entries:
+            self.forget(entry.pid)
+        self.entries[entry.pid] = entry
+        if entry.name:
+            self.name_index.setdefault(entry.name.lower(), set()).add(entry.pid)
+
+    def forget(self, pid):
+        entry = self.entries.pop(pid, None)
+        if entry is not None and entry.name:
+            self.discard(self.name_index, entry.name.lower(), pid)
+        for token in set(self.cmdlines.pop(pid, ())):
+            self.discard(self.token_index, token, pid)
+
+    @staticmethod
+    def discard(index, key, pid):
+        pids = index.get(key)
+        if pids is not None:
+            pids.discard(pid)
+            if not pids:
+                del index[key]
+
+    @staticmethod
+    def list_pids():
+        return psutil.pids()
+
+    @staticmethod
+    def create_time(pid):
+        try:
+            return psutil.Process(pid).create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+    @staticmethod
+    def resolve(pid):
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                create_time = proc.create_time()
+                try:
+                    name = proc.name()
+                except psutil.AccessDenied:
+                    name = None
+                try:
+                    exe = proc.exe()
+                except (psutil.AccessDenied, psutil.ZombieProcess, OSError):
+                    exe = None
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+        return ProcessEntry(pid, create_time, name, exe)
+
+    def track(self, pid):
+        # 事件源报告的 pid 可能是刚 exec 的旧 pid，总是重新解析
+        entry = self.resolve(pid)
+        with self.lock:
+            if entry is None:
+                self.forget(pid)
+            else:
+                self.remember(entry)
+        return entry
+
+    def process(self, entry):
+        # 核对创建时间，pid 被复用时按进程已退出处理，避免误杀；同时重新解析该 pid，记下复用它的新进程
+        proc = psutil.Process(entry.pid)
+        if proc.create_time() != entry.create_time:
+            self.track(entry.pid)
+            raise psutil.NoSuchProcess(entry.pid)
+        return proc
+
+PROCESS_SCANNER = ProcessScanner()
+
+class ProcessTreeKiller:
+    # 按进程树终止：根进程及其全部子孙在线程池上并发 terminate，限时等待后对仍存活的进程 kill，
+    # 一轮内整棵树退出，避免幸存的父进程或辅助进程把子进程重新拉起
+    def __init__(self, workers=KILL_WORKERS, grace=KILL_GRACE, timeout=KILL_TIMEOUT):
+        self.workers = workers
+        self.grace = grace
+        self.timeout = timeout
+        self.pool = None
+
+    @staticmethod
+    def find_root(proc, matcher):
+        # 向上找到仍命中同一规则的最外层祖先，例如浏览器的主进程
+        root = proc
+        while True:
+            try:
+                parent = root.parent()
+                if parent is None or parent.pid == os.getpid() or not matcher.matches(parent.name() or ""):
+                    return root
+            except psutil.Error:
+                return root
+            root = parent
+
+    @staticmethod
+    def collect(roots):
+        trees = {}
+        members = {}
+        for root in roots:
+            if root.pid in members:
+                continue
+            tree = [root]
+            try:
+                tree += root.children(recursive=True)
+            except psutil.Error:
+                pass
+            tree = [proc for proc in tree if proc.pid not in members and proc.pid != os.getpid()]
+            for proc in tree:
+                members[proc.pid] = proc
+            trees[root.pid] = [proc.pid for proc in tree]
+        return trees, members
+
+    def signal_all(self, procs, method):
+        def send(proc):
+            try:
+                getattr(proc, method)()
+            except psutil.Error:
+                pass
+        if len(procs) == 1:
+            send(procs[0])
+            return
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='process-kill')
+        list(self.pool.map(send, procs))
+
+    def terminate(self, roots):
+        # 返回 (进程树 {根 pid: [成员 pid]}, 仍存活的 pid 集合)
+        trees, members = self.collect(roots)
+        procs = list(members.values())
+        if not procs:
+            return trees, set()
+        self.signal_all(procs, 'terminate')
+        _, alive = psutil.wait_procs(procs, timeout=self.grace)
+        if alive:
+            self.signal_all(alive, 'kill')
+            _, alive = psutil.wait_procs(alive, timeout=self.timeout)
+        return trees, {proc.pid for proc in alive}
+
+ExeIdentity = namedtuple('ExeIdentity', ['digest', 'publisher'])
+# ExecutableIdentityCache.lookup 在没有结果时返回的状态
+IDENTITY_PENDING = 'pending'
+IDENTITY_FAILED = 'failed'
+
+def hash_file(path, chunk=HASH_CHUNK):
+    # 通过 mmap 分块喂给 sha256，不把整个可执行文件读进内存
+    import mmap
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                for offset in range(0, size, chunk):
+                    digest.update(view[offset:offset + chunk])
+    return digest.hexdigest()
+
+def read_publisher(path):
+    # 取版本信息中的 CompanyName，未签名校验，只是文件自报的发行者
+    if sys.platform != 'win32':
+        return None
+    import pywintypes
+    import win32api
+    try:
+        translations = win32api.GetFileVersionInfo(path, '\\VarFileInfo\\Translation') or []
+        for language, codepage in translations:
+            company = win32api.GetFileVersionInfo(
+                path, f'\\StringFileInfo\\{language:04x}{codepage:04x}\\CompanyName')
+            if company:
+                return company.strip()
+    except pywintypes.error:
+        pass
+    return None
+
+class ExecutableIdentityCache:
+    # 可执行文件身份缓存：(路径, 修改时间, 大小) -> 摘要与发行者，持久化到磁盘；
+    # 已知文件在扫描中只需一次 stat 和字典查找，未知文件交给哈希线程池，算完（成功或失败）后通知执法核心重查；
+    # 读取失败的文件同样按 (路径, 修改时间, 大小) 记住，文件不变就不再重算
+    def __init__(self, path=EXE_HASH_FILE, workers=HASH_WORKERS, on_hashed=None):
+        self.store = ConfigStore(path, delay=HASH_CACHE_FLUSH_DELAY, readonly=False)
+        self.workers = workers
+        self.on_hashed = on_hashed
+        self.lock = threading.Lock()
+        self.known = {}
+        self.failed = {}
+        self.pending = set()
+        self.pool = None
+
+    def load(self):
+        try:
+            data = self.store.load()
+        except (OSError, ValueError):
+            return
+        for key, (mtime, size, digest, publisher) in data.items():
+            self.known[key] = (mtime, size, ExeIdentity(digest, publisher))
+
+    def lookup(self, path):
+        # 返回 ExeIdentity，或 IDENTITY_PENDING（已提交计算，结果出来后会回调 on_hashed）、IDENTITY_FAILED（文件不可读）
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return IDENTITY_FAILED
+        key = os.path.normcase(path)
+        version = (stat.st_mtime, stat.st_size)
+        cached = self.known.get(key)
+        if cached is not None and cached[:2] == version:
+            return cached[2]
+        with self.lock:
+            if self.failed.get(key) == version:
+                return IDENTITY_FAILED
+            if key in self.pending:
+                return IDENTITY_PENDING
+            self.pending.add(key)
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='supervisor-hash')
+        self.pool.submit(self.compute, path, key, stat)
+        return IDENTITY_PENDING
+
+    def compute(self, path, key, stat):
+        version = (stat.st_mtime, stat.st_size)
+        try:
+            identity = ExeIdentity(hash_file(path), read_publisher(path))
+            after = os.stat(path)
+        except OSError as e:
+            print(f"计算文件摘要失败: {path} ({str(e)})")
+            identity = None
+        with self.lock:
+            self.pending.discard(key)
+            if identity is None:
+                self.failed[key] = version
+        # 计算期间文件被替换时丢弃结果，重查时按新文件重新计算
+        if identity is not None and (after.st_mtime, after.st_size) == version:
+            self.known[key] = (stat.st_mtime, stat.st_size, identity)
+            self.store.update(**{key: [stat.st_mtime, stat.st_size, identity.digest, identity.publisher]})
+        if self.on_hashed is not None:
+            self.on_hashed(path)
+
+    def flush(self):
+        self.store.flush()
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        self.flush()
+
+class ProcessEventSource:
+    # 进程启动事件源：push 为 True 时由后台线程实时回调新进程 pid，无需定时全表扫描
+    name = 'base'
+    push = True
+
+    def __init__(self):
+        self.running = False
+        self.ready = threading.Event()
+        self.error = None
+        self.thread = None
+
+    def start(self, on_start, on_overflow=None, on_failed=None):
+        # on_overflow：内核丢弃了事件，需要全表核对一次；on_failed：事件源已失效，需改用轮询
+        self.on_start = on_start
+        self.on_overflow = on_overflow
+        self.on_failed = on_failed
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        if not self.ready.wait(EVENT_SOURCE_START_TIMEOUT):
+            self.running = False
+            raise TimeoutError(f"{self.name} 启动超时")
+        if self.error is not None:
+            self.running = False
+            raise self.error
+
+    def stop(self, timeout=EVENT_SOURCE_STOP_TIMEOUT):
+        # 等待事件线程退出（wait_events 最多阻塞约 1 秒），之后不会再有回调
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def run(self):
+        try:
+            handle = self.open()
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        try:
+            while self.running:
+                pids = self.wait_events(handle)
+                if pids is None:
+                    # 事件缓冲区溢出：继续读取，漏掉的进程由一次全表核对补上
+                    if self.on_overflow is not None:
+                        self.on_overflow()
+                    continue
+                for pid in pids:
+                    if not self.running:
+                        break
+                    try:
+                        self.on_start(pid)
+                    except Exception as e:
+                        print(f"处理进程启动事件失败 {pid}: {str(e)}")
+        except Exception as e:
+            print(f"进程事件源 {self.name} 已停止: {str(e)}")
+            # 不再有推送事件，执法改回定时轮询
+            self.push = False
+            if self.running and self.on_failed is not None:
+                self.on_failed(self)
+        finally:
+            self.close(handle)
+
+    def open(self):
+        raise NotImplementedError
+
+    def wait_events(self, handle):
+        # 返回新进程 pid 列表；返回 None 表示有事件丢失，抛出异常表示事件源失效
+        raise NotImplementedError
+
+    def close(self, handle):
+        pass
+
+class WmiProcessEventSource(ProcessEventSource):
+    # Windows：订阅 WMI 的 Win32_ProcessStartTrace（需要管理员权限）
+    name = 'wmi'
+    WBEM_E_TIMED_OUT = 0x80043001
+
+    def open(self):
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        wmi = win32com.client.GetObject(r"winmgmts:{impersonationLevel=impersonate}!\\.\root\cimv2")
+        return wmi.ExecNotificationQuery("SELECT ProcessID FROM Win32_ProcessStartTrace")
+
+    def wait_events(self, watcher):
+        import pywintypes
+        try:
+            event = watcher.NextEvent(1000)
+        except pywintypes.com_error as e:
+            # 只有等待超时才算没有事件；连接断开等其他错误交给 run 结束事件源
+            excepinfo = e.args[2] if len(e.args) > 2 else None
+            codes = [e.args[0]] + ([excepinfo[5]] if excepinfo and len(excepinfo) > 5 else [])
+            if any(code is not None and code & 0xFFFFFFFF == self.WBEM_E_TIMED_OUT for code in codes):
+                return ()
+            raise
+        return (int(event.ProcessID),)
+
+    def close(self, watcher):
+        import pythoncom
+        pythoncom.CoUninitialize()
+
+class NetlinkProcessEventSource(ProcessEventSource):
+    # Linux：通过 netlink proc connector 接收 exec 事件（需要 CAP_NET_ADMIN）
+    name = 'netlink'
+    NETLINK_CONNECTOR = 11
+    CN_IDX_PROC = 1
+    CN_VAL_PROC = 1
+    NLMSG_DONE = 3
+    PROC_CN_MCAST_LISTEN = 1
+    PROC_EVENT_EXEC = 0x00000002
+    NLMSG_HEADER = struct.Struct("=LHHLL")
+    CN_MSG_HEADER = struct.Struct("=LLLLHH")
+    EVENT_HEADER = struct.Struct("=LLQ")
+    EXEC_EVENT = struct.Struct("=LL")
+
+    def open(self):
+        import socket
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, self.NETLINK_CONNECTOR)
+        try:
+            sock.bind((os.getpid(), self.CN_IDX_PROC))
+            payload = struct.pack("=L", self.PROC_CN_MCAST_LISTEN)
+            cn_msg = self.CN_MSG_HEADER.pack(self.CN_IDX_PROC, self.CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+            header = self.NLMSG_HEADER.pack(self.NLMSG_HEADER.size + len(cn_msg), self.NLMSG_DONE, 0, 0, os.getpid())
+            sock.send(header + cn_msg)
+            sock.settimeout(1.0)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def wait_events(self, sock):
+        try:
+            data = sock.recv(65536)
+        except TimeoutError:
+            return ()
+        except OSError as e:
+            # 短时间内大量进程启动时接收缓冲区溢出，事件已丢失但套接字仍可继续读取
+            if e.errno == errno.ENOBUFS:
+                return None
+            raise
+        pids = []
+        offset = 0
+        while offset + self.NLMSG_HEADER.size <= len(data):
+            length = self.NLMSG_HEADER.unpack_from(data, offset)[0]
+            if length < self.NLMSG_HEADER.size:
+                break
+            event_offset = offset + self.NLMSG_HEADER.size + self.CN_MSG_HEADER.size
+            if event_offset + self.EVENT_HEADER.size + self.EXEC_EVENT.size <= offset + length:
+                what = self.EVENT_HEADER.unpack_from(data, event_offset)[0]
+                if what == self.PROC_EVENT_EXEC:
+                    pid, tgid = self.EXEC_EVENT.unpack_from(data, event_offset + self.EVENT_HEADER.size)
+                    if pid == tgid:
+                        pids.append(tgid)
+            offset += (length + 3) & ~3
+        return pids
+
+    def close(self, sock):
+        sock.close()
+
+class PollingProcessEventSource(ProcessEventSource):
+    # 兜底方案：沿用 psutil 轮询，由 process_monitor 按 ENFORCEMENT_INTERVAL 扫描
+    name = 'polling'
+    push = False
+
+    def start(self, on_start, on_overflow=None, on_failed=None):
+        self.on_start = on_start
+        self.running = True
+
+def create_process_event_source(on_start, on_overflow=None, on_failed=None):
+    backends = []
+    if sys.platform == 'win32':
+        backends.append(WmiProcessEventSource)
+    elif sys.platform.startswith('linux'):
+        backends.append(NetlinkProcessEventSource)
+    for backend in backends:
+        source = backend()
+        try:
+            source.start(on_start, on_overflow, on_failed)
+            return source
+        except Exception as e:
+            print(f"进程事件源 {backend.name} 不可用，改用轮询: {str(e)}")
+    source = PollingProcessEventSource()
+    source.start(on_start)
+    return source
+
+class MetricCounter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items())) if labels else ()
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+    def snapshot(self):
+        with self.lock:
+            return [{'labels': dict(key), 'value': value} for key, value in self.values.items()]
+
+class MetricHistogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items())) if labels else ()
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def cumulative(self, counts):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(float(bound))), total
+
+    def samples(self):
+        with self.lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self.series.items()]
+        result = []
+        for key, counts, total, count in series:
+            for bound, cumulative in self.cumulative(counts):
+                result.append((self.name + '_bucket', key + (('le', bound),), cumulative))
+            result.append((self.name + '_sum', key, total))
+            result.append((self.name + '_count', key, count))
+        return result
+
+    def snapshot(self):
+        with self.lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self.series.items()]
+        return [{'labels': dict(key), 'buckets': dict(self.cumulative(counts)), 'sum': total, 'count': count}
+                for key, counts, total, count in series]
+
+class MetricsRegistry:
+    # 进程内指标：热路径上每次记录只是一次加锁的累加，格式化只在导出时进行
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, help_text):
+        return self.metrics.setdefault(name, MetricCounter(name, help_text))
+
+    def histogram(self, name, help_text, buckets):
+        return self.metrics.setdefault(name, MetricHistogram(name, help_text, buckets))
+
+    def render(self):
+        # Prometheus 文本格式 0.0.4
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{self.format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {
+            'updated_at': time.time(),
+            'metrics': {metric.name: {'type': metric.kind, 'help': metric.help, 'series': metric.snapshot()}
+                        for metric in list(self.metrics.values())},
+        }
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for _, value in labels)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+METRICS = MetricsRegistry()
+SCAN_SECONDS = METRICS.histogram('supervisor_scan_seconds', "一次执法扫描（收集候选并拦截）的耗时", LATENCY_BUCKETS)
+PROCESSES_EXAMINED = METRICS.counter('supervisor_processes_examined_total', "执法扫描检查过的进程数")
+KILLS = METRICS.counter('supervisor_kills_total', "按黑名单规则终止的进程数")
+SPAWN_TO_KILL_SECONDS = METRICS.histogram('supervisor_spawn_to_kill_seconds', "黑名单进程从创建到被终止的时间", SPAWN_BUCKETS)
+CONFIG_SAVE_SECONDS = METRICS.histogram('supervisor_config_save_seconds', "配置文件原子写盘耗时", LATENCY_BUCKETS)
+ALERTS = METRICS.counter('supervisor_alerts_total', "按动作类型统计的监督动作执行次数")
+CADENCE_DECISIONS = METRICS.counter('supervisor_cadence_decisions_total', "按原因统计的进程扫描节奏决策")
+
+def start_metrics_server(registry=METRICS, port=METRICS_PORT, pages=None):
+    # 只监听本机回环地址，端口被占用时不影响执法；http.server 按需导入，守护进程不加载
+    import http.server
+
+    class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            registry = self.server.registry
+            if self.path == '/metrics':
+                body = registry.render().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body = json.dumps(registry.snapshot(), ensure_ascii=False).encode('utf-8')
+                content_type = 'application/json; charset=utf-8'
+            elif self.path in self.server.pages:
+                body = json.dumps(self.server.pages[self.path](), ensure_ascii=False).encode('utf-8')
+                content_type = 'application/json; charset=utf-8'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', port), MetricsRequestHandler)
+    except OSError as e:
+        print(f"指标端口 {port} 不可用: {str(e)}")
+        return None
+    server.daemon_threads = True
+    server.registry = registry
+    # 额外的 JSON 页面：路径 -> 返回可序列化数据的函数
+    server.pages = pages or {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class AsyncRuntime:
+    # 执法核心唯一的事件循环：在独立线程中运行 asyncio；定时任务按键覆盖，
+    # 同一键的任务不会并发执行，阻塞的 psutil / 子进程调用交给有界线程池
+    def __init__(self, workers=RUNTIME_WORKERS, max_sleep=SCHEDULER_MAX_SLEEP, clock=SYSTEM_CLOCK):
+        import asyncio
+        self.clock = clock
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='supervisor-io')
+        self.loop.set_default_executor(self.executor)
+        self.max_sleep = max_sleep
+        self.handles = {}
+        self.running = {}
+        self.rerun = {}
+        self.thread = None
+        self.closing = False
+
+    def start(self):
+        self.thread = threading.Thread(target=self.loop.run_forever, name='supervisor-runtime', daemon=True)
+        self.thread.start()
+
+    def call_at(self, key, when, callback):
+        # 线程安全；when 为墙上时钟时间戳，callback 可以是协程函数或普通函数
+        self.loop.call_soon_threadsafe(self.schedule, key, when, callback)
+
+    def call_later(self, key, delay, callback):
+        # 线程安全；按事件循环的单调时钟延迟 delay 秒执行，墙上时钟被调整也不会提前或推迟
+        self.loop.call_soon_threadsafe(self.schedule_later, key, delay, callback)
+
+    def cancel(self, key):
+        self.loop.call_soon_threadsafe(self.unschedule, key)
+
+    def schedule_later(self, key, delay, callback):
+        if self.closing:
+            return
+        self.unschedule(key)
+        self.handles[key] = self.loop.call_later(max(0.0, delay), self.fire, key, None, callback)
+
+    def schedule(self, key, when, callback):
+        # 停止过程中被取消的任务会在 finally 里重新安排下一轮，忽略即可
+        if self.closing:
+            return
+        self.unschedule(key)
+        # 墙上时钟可能被调整或系统休眠，最长等待 max_sleep 后重新核对
+        delay = min(max(0.0, when - self.clock.time()), self.max_sleep)
+        self.handles[key] = self.loop.call_later(delay, self.fire, key, when, callback)
+
+    def unschedule(self, key):
+        handle = self.handles.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+
+    def fire(self, key, when, callback):
+        self.handles.pop(key, None)
+        # call_later 安排的任务 when 为 None，到期即执行，不再按墙上时钟核对
+        if when is not None and self.clock.time() < when - 0.001:
+            self.schedule(key, when, callback)
+        elif key in self.running:
+            # 上一轮仍在执行，结束后立即补跑一次
+            self.rerun[key] = callback
+        else:
+            self.spawn(key, callback)
+
+    def spawn(self, key, callback):
+        try:
+            result = callback()
+        except Exception as e:
+            print(f"调度任务执行失败 {key}: {str(e)}")
+            return
+        if isinstance(result, types.CoroutineType):
+            task = self.loop.create_task(result)
+            self.running[key] = task
+            task.add_done_callback(lambda task: self.finished(key, task))
+
+    def finished(self, key, task):
+        self.running.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"调度任务执行失败 {key}: {str(task.exception())}")
+        callback = self.rerun.pop(key, None)
+        if callback is not None and not task.cancelled():
+            self.spawn(key, callback)
+
+    async def run_blocking(self, function, *args):
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    def submit_blocking(self, function, *args):
+        # 供其他线程（如进程事件源）直接把阻塞工作交给同一个线程池
+        return self.executor.submit(function, *args)
+
+    async def shutdown(self):
+        self.closing = True
+        for key in list(self.handles):
+            self.unschedule(key)
+        self.rerun.clear()
+        tasks = list(self.running.values())
+        for task in tasks:
+            task.cancel()
+        import asyncio
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self, timeout=5):
+        # 结构化停止：取消定时任务并等待进行中的任务收尾，再停止事件循环与线程池
+        if self.thread is not None and self.loop.is_running():
+            import asyncio
+            try:
+                asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(timeout)
+            except Exception as e:
+                print(f"停止执法循环超时: {str(e)}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class ConfigStore:
+    # 配置写回缓存：内存中保存权威状态，短暂防抖后经临时文件 + 重命名原子写盘
+    def __init__(self, path, delay=CONFIG_FLUSH_DELAY, readonly=True):
+        self.path = path
+        self.delay = delay
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        # 写盘串行化：与 lock 分开，写文件期间不阻塞 update
+        self.write_lock = threading.Lock()
+        self.data = {}
+        self.version = 0
+        self.flushed_version = 0
+        self.timer = None
+        self.deadline = None
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        with self.lock:
+            self.data = data
+            self.version += 1
+            self.flushed_version = self.version
+            return copy.deepcopy(data)
+
+    def update(self, **values):
+        return self.adopt(**copy.deepcopy(values))
+
+    def adopt(self, **values):
+        # 不复制直接接管：调用方保证之后不再修改这些值
+        with self.lock:
+            self.data.update(values)
+            self.version += 1
+            # 防抖：每次修改只把截止时间往后推，连续修改（如拖动窗口）期间始终只有一个计时线程
+            self.deadline = time.monotonic() + self.delay
+            if self.timer is None:
+                self.arm(self.delay)
+            return self.version
+
+    def arm(self, delay):
+        self.timer = threading.Timer(delay, self.expire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def expire(self):
+        with self.lock:
+            # 已被 flush 取消或换成了新的计时线程
+            if self.timer is not threading.current_thread():
+                return
+            left = self.deadline - time.monotonic()
+            if left > 0:
+                self.arm(left)
+                return
+            self.timer = None
+        self.flush()
+
+    def is_dirty(self):
+        return self.flushed_version != self.version
+
+    def flush(self):
+        with self.write_lock:
+            with self.lock:
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+                self.deadline = None
+                if not self.is_dirty():
+                    return
+                version = self.version
+                payload = json.dumps(self.data)
+            try:
+                with CONFIG_SAVE_SECONDS.time(file=os.path.basename(self.path)):
+                    self.write(payload, version)
+            except Exception as e:
+                print(f"保存配置失败: {str(e)}")
+                return
+            with self.lock:
+                self.flushed_version = max(self.flushed_version, version)
+
+    def is_stale(self, version):
+        # 替换前复查：已落盘的版本不比这次新时才覆盖，旧内容不会盖过新内容
+        with self.lock:
+            return version <= self.flushed_version
+
+    def write(self, payload, version):
+        fd, temp_path = tempfile.mkstemp(prefix='.supervisor_config.', suffix='.tmp',
+                                         dir=os.path.dirname(self.path))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            # 临时文件先设为只读，重命名后新配置即为只读；Windows 不能覆盖只读文件，需先解除目标的只读
+            os.chmod(temp_path, 0o444 if self.readonly else 0o666)
+            if self.is_stale(version):
+                os.chmod(temp_path, 0o666)
+                os.remove(temp_path)
+                return
+            if os.name == 'nt' and self.readonly and os.path.exists(self.path):
+                os.chmod(self.path, 0o666)
+            os.replace(temp_path, self.path)
+        except Exception:
+            try:
+                os.chmod(temp_path, 0o666)
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+class ActionTracker:
+    # 每个监督时段每天的生命周期：pending -> grace -> active -> fired -> ended，
+    # 动作只在进入执行期时触发一次（可选按 repeat_interval 分钟重复），状态持久化以跨越重启
+    def __init__(self, path, clock=SYSTEM_CLOCK):
+        self.store = ConfigStore(path, readonly=False)
+        try:
+            self.store.load()
+        except (OSError, ValueError):
+            pass
+        today = clock.now().date().isoformat()
+        self.records = {key: record for key, record in self.store.data.items()
+                        if isinstance(record, dict) and record.get('date') == today}
+        self.session_start = self.boot_time()
+
+    @staticmethod
+    def boot_time():
+        try:
+            return psutil.boot_time()
+        except Exception:
+            return 0.0
+
+    @staticmethod
+    def item_key(item):
+        return f"{item['name']}|{item['start']}|{item['end']}|{item['action']}"
+
+    def record(self, item, moment):
+        today = moment.date().isoformat()
+        record = self.records.get(self.item_key(item))
+        if record is None or record['date'] != today:
+            record = {'date': today, 'state': 'pending', 'fired_at': None}
+        return record
+
+    def save(self, item, record):
+        key = self.item_key(item)
+        if self.records.get(key) != record:
+            self.records[key] = record
+            self.store.update(**{key: record})
+
+    def advance(self, item, phase, moment):
+        # 返回 True 表示调用方应当执行该事项的动作
+        record = dict(self.record(item, moment))
+        fire = False
+        if phase == 'active':
+            if record['state'] != 'fired':
+                fire = True
+            elif self.forced_again(item, record):
+                fire = True
+            else:
+                fire = self.repeat_due(item, record, moment) == 0
+            if fire:
+                record['state'] = 'active'
+        else:
+            record['state'] = phase
+        self.save(item, record)
+        return fire
+
+    def mark_fired(self, item, moment):
+        record = dict(self.record(item, moment))
+        record['state'] = 'fired'
+        record['fired_at'] = moment.timestamp()
+        self.save(item, record)
+
+    def forced_again(self, item, record):
+        # 程序重启不重复执行，但关机、锁定若是在本次开机之前执行的，重启电脑即可绕过，需要再执行一次
+        return (item['action'] in ('关机', '锁定') and record.get('fired_at') is not None and
+                record['fired_at'] < self.session_start)
+
+    @staticmethod
+    def repeat_due(item, record, moment):
+        # 距离下次重复执行的秒数；不重复时返回 None
+        interval = item.get('repeat_interval', 0) * 60
+        if not interval or record.get('fired_at') is None:
+            return None
+        return max(0, record['fired_at'] + interval - moment.timestamp())
+
+    def seconds_until_repeat(self, items, moment):
+        delays = [self.repeat_due(item, self.record(item, moment), moment) for item in items]
+        delays = [delay for delay in delays if delay is not None]
+        return min(delays) if delays else None
+
+    def flush(self):
+        self.store.flush()
+
+class LastInputInfo(ctypes.Structure):
+    _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
+
+def session_state():
+    # 返回 (是否锁屏, 用户无输入的秒数)；非 Windows 或以服务运行在会话 0 时无法判断，视为活跃
+    if sys.platform != 'win32':
+        return False, 0
+    user32 = ctypes.windll.user32
+    kernel32 = ctypes.windll.kernel32
+    session = ctypes.c_ulong()
+    if not kernel32.ProcessIdToSessionId(kernel32.GetCurrentProcessId(), ctypes.byref(session)) or not session.value:
+        return False, 0
+    # 锁屏时输入桌面是 Winlogon，普通进程既打不开它也无法切回 Default 桌面；
+    # 打不开 Default 桌面时无从判断，按未锁屏处理
+    locked = False
+    desktop = user32.OpenDesktopW("Default", 0, False, DESKTOP_SWITCHDESKTOP)
+    if desktop:
+        locked = not user32.SwitchDesktop(desktop)
+        user32.CloseDesktop(desktop)
+    info = LastInputInfo()
+    info.cbSize = ctypes.sizeof(info)
+    idle = 0
+    if user32.GetLastInputInfo(ctypes.byref(info)):
+        idle = ((kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000
+    return locked, idle
+
+def foreground_pid():
+    # 只有 Windows 能可靠取得前台窗口；其他平台返回 None，不采样
+    if sys.platform != 'win32':
+        return None
+    user32 = ctypes.windll.user32
+    hwnd = user32.GetForegroundWindow()
+    if not hwnd:
+        return None
+    pid = ctypes.c_ulong()
+    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    return pid.value or None
+
+class UsageLog:
+    # 前台应用用量：每次采样追加一条定长 uint32 记录 [时间戳, 应用 id << 16 | 时段 id]，名称只在首次出现时登记；
+    # 已结束的日期汇总进日表 [日序号, 键, 采样数]，查询时整日读日表、当天用 mmap 二分定位原始记录
+    HEADER = struct.Struct('<4sIII')
+    SAMPLES_MAGIC = b'SUSG'
+    DAILY_MAGIC = b'SUSD'
+    MAX_ID = 0xFFFF
+
+    def __init__(self, directory=USAGE_DIR, interval=USAGE_SAMPLE_INTERVAL, clock=SYSTEM_CLOCK):
+        self.directory = directory
+        self.interval = interval
+        self.clock = clock
+        self.samples_path = os.path.join(directory, 'samples.bin')
+        self.daily_path = os.path.join(directory, 'daily.bin')
+        self.names_path = os.path.join(directory, 'names.txt')
+        self.lock = threading.Lock()
+        self.names = ['']
+        self.ids = {'': 0}
+        self.samples = None
+        self.daily = None
+        self.rolled_until = None
+        self.last_day = None
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            try:
+                with open(self.names_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        self.ids.setdefault(line.rstrip('\n'), len(self.names))
+                        self.names.append(line.rstrip('\n'))
+            except FileNotFoundError:
+                pass
+            self.samples = self.open_log(self.samples_path, self.SAMPLES_MAGIC, 2)
+            self.daily = self.open_log(self.daily_path, self.DAILY_MAGIC, 3)
+            with self.mapped(self.daily_path) as view:
+                if len(view) >= 3:
+                    self.rolled_until = view[len(view) - 3]
+        return self
+
+    def open_log(self, path, magic, width):
+        # 校验文件头并截掉崩溃时写了一半的记录，保证之后追加的记录仍然对齐
+        record_size = width * 4
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(self.HEADER.size)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            header, size = b'', 0
+        if size and (len(header) < self.HEADER.size or self.HEADER.unpack(header)[0] != magic):
+            print(f"用量记录文件格式不符，已另存为 .bad: {path}")
+            os.replace(path, path + '.bad')
+            size = 0
+        if size:
+            if magic == self.SAMPLES_MAGIC:
+                self.interval = self.HEADER.unpack(header)[2]
+            aligned = self.HEADER.size + (size - self.HEADER.size) // record_size * record_size
+            if aligned != size:
+                os.truncate(path, aligned)
+        f = open(path, 'ab')
+        if not size:
+            f.write(self.HEADER.pack(magic, 1, self.interval, 0))
+            f.flush()
+        return f
+
+    def close(self):
+        with self.lock:
+            for f in (self.samples, self.daily):
+                if f is not None:
+                    f.close()
+            self.samples = self.daily = None
+
+    def intern(self, name):
+        # 调用方持有 self.lock；id 用完时归入 0（未知）
+        name_id = self.ids.get(name)
+        if name_id is None:
+            if len(self.names) > self.MAX_ID:
+                return 0
+            name_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            with open(self.names_path, 'a', encoding='utf-8') as f:
+                f.write(name.replace('\n', ' ') + '\n')
+        return name_id
+
+    def append(self, timestamp, app, item=''):
+        day = datetime.fromtimestamp(timestamp).toordinal()
+        with self.lock:
+            if self.last_day is not None and day != self.last_day:
+                self.roll_up(day)
+            self.last_day = day
+            key = self.intern(app) << 16 | self.intern(item)
+            array('I', [int(timestamp), key]).tofile(self.samples)
+            self.samples.flush()
+
+    @contextlib.contextmanager
+    def mapped(self, path):
+        # 只读映射记录区，按 uint32 访问；调用方在退出前不得保留切片
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= self.HEADER.size:
+                yield memoryview(array('I'))
+                return
+            import mmap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)[self.HEADER.size:size - (size - self.HEADER.size) % 4].cast('I')
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    @staticmethod
+    def lower_bound(view, width, value):
+        # 第一条首列 >= value 的记录序号；记录按首列（时间戳或日序号）递增追加
+        lo, hi = 0, len(view) // width
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if view[mid * width] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @staticmethod
+    def day_start(day):
+        return int(datetime.fromordinal(day).timestamp())
+
+    def roll_up(self, today):
+        # 调用方持有 self.lock；把 today 之前尚未汇总的日期写入日表
+        self.samples.flush()
+        rows = array('I')
+        with self.mapped(self.samples_path) as view:
+            if len(view) < 2:
+                return
+            first = self.rolled_until + 1 if self.rolled_until is not None else \
+                datetime.fromtimestamp(view[0]).toordinal()
+            start = self.lower_bound(view, 2, self.day_start(first))
+            for day in range(first, today):
+                end = self.lower_bound(view, 2, self.day_start(day + 1))
+                if end > start:
+                    for key, count in sorted(Counter(view[start * 2 + 1:end * 2:2]).items()):
+                        rows.extend((day, key, count))
+                start = end
+        if rows:
+            rows.tofile(self.daily)
+            self.daily.flush()
+        if today - 1 >= (self.rolled_until or 0):
+            self.rolled_until = today - 1
+
+    def totals(self, start, end):
+        # 返回 {(应用, 时段): 秒数}，start/end 为包含两端的 date
+        today = self.clock.now().toordinal()
+        first, last = start.toordinal(), end.toordinal()
+        counts = Counter()
+        with self.lock:
+            if self.samples is None:
+                return {}
+            if self.rolled_until is None or self.rolled_until < today - 1:
+                self.roll_up(today)
+            with self.mapped(self.daily_path) as view:
+                lo = self.lower_bound(view, 3, first)
+                hi = self.lower_bound(view, 3, min(last, today - 1) + 1)
+                for key, count in zip(view[lo * 3 + 1:hi * 3:3], view[lo * 3 + 2:hi * 3:3]):
+                    counts[key] += count
+            if first <= today <= last:
+                self.samples.flush()
+                with self.mapped(self.samples_path) as view:
+                    lo = self.lower_bound(view, 2, self.day_start(today))
+                    hi = self.lower_bound(view, 2, self.day_start(today + 1))
+                    counts.update(view[lo * 2 + 1:hi * 2:2])
+            names = list(self.names)
+        return {(names[key >> 16], names[key & 0xFFFF]): count * self.interval for key, count in counts.items()}
+
+    def app_totals(self, start, end):
+        result = Counter()
+        for (app, _), seconds in self.totals(start, end).items():
+            result[app] += seconds
+        return dict(result)
+
+    def item_totals(self, start, end):
+        # 键为监督时段的 ActionTracker.item_key，空字符串表示不在任何时段内
+        result = Counter()
+        for (_, item), seconds in self.totals(start, end).items():
+            result[item] += seconds
+        return dict(result)
+
+    @staticmethod
+    def week_range(day):
+        monday = day - timedelta(days=day.weekday())
+        return monday, monday + timedelta(days=6)
+
+class TomatoTimer:
+    # 番茄钟：按时钟的单调时间计截止时间，由调度线程在到期时核对，
+    # 界面只读取剩余时间，关闭面板或 Tk 线程阻塞都不影响计时
+    def __init__(self, runtime, history_path=TOMATO_HISTORY_FILE, on_finish=None, clock=SYSTEM_CLOCK):
+        self.runtime = runtime
+        self.clock = clock
+        self.on_finish = on_finish
+        self.lock = threading.Lock()
+        self.durations = {'focus': 1500, 'short_break': 300, 'long_break': 900}
+        self.long_break_every = TOMATO_LONG_BREAK_EVERY
+        self.phase = 'focus'
+        self.completed_focus = 0
+        self.deadline = None
+        self.paused_remaining = None
+        self.started_at = None
+        self.history = ConfigStore(history_path, readonly=False)
+        try:
+            self.history.load()
+        except (OSError, ValueError):
+            pass
+
+    def configure(self, focus=None, short_break=None, long_break=None):
+        with self.lock:
+            for phase, seconds in (('focus', focus), ('short_break', short_break), ('long_break', long_break)):
+                if seconds:
+                    self.durations[phase] = seconds
+
+    def state(self):
+        if self.deadline is not None:
+            return 'running'
+        if self.paused_remaining is not None:
+            return 'paused'
+        return 'idle'
+
+    def remaining(self):
+        with self.lock:
+            if self.deadline is not None:
+                return max(0.0, self.deadline - self.clock.monotonic())
+            if self.paused_remaining is not None:
+                return self.paused_remaining
+            return float(self.durations[self.phase])
+
+    def start(self):
+        with self.lock:
+            if self.deadline is not None:
+                return
+            if self.paused_remaining is None:
+                self.started_at = self.clock.time()
+                left = self.durations[self.phase]
+            else:
+                left = self.paused_remaining
+            self.paused_remaining = None
+            self.deadline = self.clock.monotonic() + left
+        self.check()
+
+    def pause(self):
+        with self.lock:
+            if self.deadline is None:
+                return
+            self.paused_remaining = max(0.0, self.deadline - self.clock.monotonic())
+            self.deadline = None
+        self.runtime.cancel('tomato')
+
+    def reset(self):
+        with self.lock:
+            if self.started_at is not None:
+                self.record(completed=False)
+            self.deadline = None
+            self.paused_remaining = None
+            self.started_at = None
+        self.runtime.cancel('tomato')
+
+    def check(self):
+        # 截止时间与唤醒都按单调时钟；最长 TOMATO_RESYNC 秒唤醒一次，系统休眠后也能及时核对
+        with self.lock:
+            if self.deadline is None:
+                return
+            left = self.deadline - self.clock.monotonic()
+            if left > 0:
+                self.runtime.call_later('tomato', min(left, TOMATO_RESYNC), self.check)
+                return
+            finished = self.phase
+            self.deadline = None
+            self.record(completed=True)
+            self.started_at = None
+            if finished == 'focus':
+                self.completed_focus += 1
+                long_break = self.completed_focus % self.long_break_every == 0
+                self.phase = 'long_break' if long_break else 'short_break'
+            else:
+                self.phase = 'focus'
+            next_phase = self.phase
+        if self.on_finish is not None:
+            self.on_finish(finished, next_phase)
+
+    def record(self, completed):
+        # 调用方持有 self.lock
+        if self.deadline is not None:
+            left = max(0.0, self.deadline - self.clock.monotonic())
+        else:
+            left = self.paused_remaining or 0.0
+        planned = self.durations[self.phase]
+        sessions = self.history.data.get('sessions', [])[-(TOMATO_HISTORY_LIMIT - 1):]
+        sessions.append({
+            'phase': self.phase,
+            'started_at': self.started_at,
+            'ended_at': self.clock.time(),
+            'planned': planned,
+            'elapsed': round(planned - left, 1),
+            'completed': completed,
+        })
+        self.history.update(sessions=sessions)
+
+    def sessions(self, since=None):
+        return [session for session in self.history.data.get('sessions', [])
+                if since is None or session['ended_at'] >= since]
+
+    def completed_today(self):
+        midnight = self.clock.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        return sum(1 for session in self.sessions(midnight)
+                   if session['phase'] == 'focus' and session['completed'])
+
+    def flush(self):
+        self.history.flush()
+
+class ProcessWaiter:
+    # 阻塞等待进程退出或停止信号：Windows 用进程句柄，Linux 用 pidfd，不轮询进程表
+    def __init__(self, stop_handle=None):
+        if sys.platform == 'win32':
+            import win32event
+            if stop_handle is None:
+                stop_handle = win32event.CreateEvent(None, True, False, None)
+            self.stop_handle = stop_handle
+        else:
+            self.stop_read, self.stop_write = os.pipe()
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        if sys.platform == 'win32':
+            import win32event
+            win32event.SetEvent(self.stop_handle)
+        else:
+            os.write(self.stop_write, b'x')
+
+    def sleep(self, seconds):
+        # 返回 True 表示在等待期间收到了停止信号
+        if sys.platform == 'win32':
+            import win32event
+            result = win32event.WaitForSingleObject(self.stop_handle, int(seconds * 1000))
+            return result == win32event.WAIT_OBJECT_0
+        ready, _, _ = select.select([self.stop_read], [], [], seconds)
+        return bool(ready)
+
+    def wait(self, pid, popen=None):
+        # 返回 True 表示进程已退出，False 表示收到停止信号
+        if sys.platform == 'win32':
+            return self.wait_handle(pid)
+        return self.wait_pidfd(pid, popen)
+
+    def wait_handle(self, pid):
+        import pywintypes
+        import win32api
+        import win32con
+        import win32event
+        try:
+            handle = win32api.OpenProcess(win32con.SYNCHRONIZE, False, pid)
+        except pywintypes.error:
+            return True
+        try:
+            result = win32event.WaitForMultipleObjects([handle, self.stop_handle], False, win32event.INFINITE)
+        finally:
+            win32api.CloseHandle(handle)
+        return result == win32event.WAIT_OBJECT_0
+
+    def wait_pidfd(self, pid, popen):
+        try:
+            fd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except (AttributeError, OSError):
+            return self.wait_psutil(pid)
+        try:
+            ready, _, _ = select.select([fd, self.stop_read], [], [])
+        finally:
+            os.close(fd)
+        if fd not in ready:
+            return False
+        if popen is not None:
+            popen.wait()
+        return True
+
+    def wait_psutil(self, pid):
+        try:
+            proc = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return True
+        while not self.stopped:
+            try:
+                proc.wait(timeout=1)
+                return True
+            except psutil.TimeoutExpired:
+                continue
+            except psutil.NoSuchProcess:
+                return True
+        return False
+
+class GuardianSupervisor:
+    # 轻量守护：持有目标进程句柄，退出后立即重启；连续快速退出时指数退避并识别崩溃循环
+    def __init__(self, command, pid=None, waiter=None, should_restart=None, on_restart=None):
+        self.command = command
+        self.pid = pid
+        self.waiter = waiter or ProcessWaiter()
+        self.should_restart = should_restart or (lambda: True)
+        self.on_restart = on_restart
+        self.backoff = 0
+        self.restarts = deque()
+
+    def stop(self):
+        self.waiter.stop()
+
+    def launch(self):
+        try:
+            return subprocess.Popen(self.command, creationflags=NO_WINDOW)
+        except Exception as e:
+            print(f"守护进程重启失败: {str(e)}")
+            return None
+
+    def next_delay(self, lifetime):
+        now = time.monotonic()
+        self.restarts.append(now)
+        while self.restarts and now - self.restarts[0] > GUARDIAN_CRASH_WINDOW:
+            self.restarts.popleft()
+        if lifetime >= GUARDIAN_STABLE_RUNTIME:
+            self.backoff = 0
+        else:
+            self.backoff = min(max(self.backoff * 2, GUARDIAN_MIN_BACKOFF), GUARDIAN_MAX_BACKOFF)
+        if len(self.restarts) >= GUARDIAN_CRASH_LIMIT:
+            print(f"检测到崩溃循环（{GUARDIAN_CRASH_WINDOW} 秒内重启 {len(self.restarts)} 次），延长等待")
+            self.backoff = GUARDIAN_MAX_BACKOFF
+        return self.backoff
+
+    def run(self):
+        pid = self.pid
+        popen = None
+        restarting = pid is not None
+        started = time.monotonic()
+        while not self.waiter.stopped:
+            if pid is None:
+                popen = self.launch()
+                started = time.monotonic()
+                if popen is None:
+                    if self.waiter.sleep(self.next_delay(0)):
+                        break
+                    continue
+                pid = popen.pid
+                if restarting and self.on_restart is not None:
+                    self.on_restart(pid)
+            if not self.waiter.wait(pid, popen):
+                break
+            pid = popen = None
+            restarting = True
+            if self.waiter.stopped or not self.should_restart():
+                break
+            delay = self.next_delay(time.monotonic() - started)
+            if delay and self.waiter.sleep(delay):
+                break
+
+class AuditLog:
+    # 执法审计日志：事件经队列交给后台线程批量写入按大小轮转的 JSON 行文件；
+    # 每个分段旁有稀疏时间索引 (时间戳, 偏移)，翻页与按时间定位只读取索引附近的一小块
+    INDEX_RECORD = struct.Struct('<dQ')
+
+    def __init__(self, directory=AUDIT_DIR, max_bytes=AUDIT_MAX_BYTES, max_files=AUDIT_MAX_FILES, clock=SYSTEM_CLOCK):
+        self.directory = directory
+        self.clock = clock
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.queue = queue.Queue(maxsize=AUDIT_QUEUE_LIMIT)
+        self.lock = threading.Lock()
+        self.indexes = {}
+        self.segment = None
+        self.file = None
+        self.index_file = None
+        self.size = 0
+        self.dropped = 0
+
+    def log_path(self, segment):
+        return os.path.join(self.directory, f"events-{segment:06d}.log")
+
+    def index_path(self, segment):
+        return os.path.join(self.directory, f"events-{segment:06d}.idx")
+
+    def segments(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[7:13]) for name in names
+                      if name.startswith('events-') and name.endswith('.log') and name[7:13].isdigit())
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        self.open_segment(segments[-1] if segments else 1)
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def open_segment(self, segment):
+        self.segment = segment
+        self.file = open(self.log_path(segment), 'ab')
+        self.index_file = open(self.index_path(segment), 'ab')
+        self.size = self.file.tell()
+        if self.size and not self.read(segment, self.size - 1, self.size).endswith(b'\n'):
+            # 上次写到一半的行单独结束，读取时按无效行跳过
+            self.file.write(b'\n')
+            self.size += 1
+
+    def record(self, kind, **fields):
+        # 只入队，不做任何 I/O；队列满时丢弃并计数，绝不阻塞执法线程
+        try:
+            self.queue.put_nowait((self.clock.time(), kind, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=2):
+        if self.file is None:
+            return
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < AUDIT_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            waiters = []
+            with self.lock:
+                for event in batch:
+                    if isinstance(event, threading.Event):
+                        waiters.append(event)
+                        continue
+                    try:
+                        self.write(*event)
+                    except (OSError, TypeError, ValueError) as e:
+                        print(f"写入审计日志失败: {str(e)}")
+                try:
+                    self.file.flush()
+                    self.index_file.flush()
+                except OSError:
+                    pass
+            for waiter in waiters:
+                waiter.set()
+
+    def write(self, timestamp, kind, fields):
+        line = (json.dumps(dict(fields, ts=timestamp, kind=kind), ensure_ascii=False) + '\n').encode('utf-8')
+        index = self.load_index(self.segment)
+        if not index or self.size - index[-1][1] >= AUDIT_INDEX_BYTES:
+            index.append((timestamp, self.size))
+            self.index_file.write(self.INDEX_RECORD.pack(timestamp, self.size))
+        self.file.write(line)
+        self.size += len(line)
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        self.index_file.close()
+        self.open_segment(self.segment + 1)
+        for segment in self.segments()[:-self.max_files]:
+            for path in (self.log_path(segment), self.index_path(segment)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.indexes.pop(segment, None)
+
+    def load_index(self, segment):
+        index = self.indexes.get(segment)
+        if index is None:
+            try:
+                with open(self.index_path(segment), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = b''
+            usable = len(data) - len(data) % self.INDEX_RECORD.size
+            index = self.indexes[segment] = list(self.INDEX_RECORD.iter_unpack(data[:usable]))
+        return index
+
+    def read(self, segment, start, end):
+        with open(self.log_path(segment), 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def end_cursor(self):
+        with self.lock:
+            if self.segment is not None:
+                return self.segment, self.size
+        segments = self.segments()
+        if not segments:
+            return None
+        return segments[-1], os.path.getsize(self.log_path(segments[-1]))
+
+    def page(self, cursor=None, limit=AUDIT_PAGE_SIZE):
+        # 返回 (由新到旧的事件, 下一页游标)；游标 (分段, 偏移) 表示只取该位置之前的事件，None 表示到头
+        cursor = cursor or self.end_cursor()
+        events = []
+        segments = self.segments()
+        while cursor is not None and len(events) < limit:
+            segment, end = cursor
+            if segment not in segments:
+                cursor = None
+                break
+            with self.lock:
+                offsets = [offset for _, offset in self.load_index(segment)]
+            block = bisect_left(offsets, end) - 1
+            start = offsets[block] if block >= 0 else 0
+            chunk = self.read(segment, start, end)
+            lines = []
+            offset = start
+            for raw in chunk.split(b'\n')[:-1] if chunk.endswith(b'\n') else chunk.split(b'\n'):
+                lines.append((offset, raw))
+                offset += len(raw) + 1
+            for line_offset, raw in reversed(lines):
+                if len(events) >= limit:
+                    break
+                try:
+                    events.append(json.loads(raw))
+                except ValueError:
+                    pass
+                end = line_offset
+            if end > 0:
+                cursor = (segment, end)
+            else:
+                older = [s for s in segments if s < segment]
+                cursor = (older[-1], os.path.getsize(self.log_path(older[-1]))) if older else None
+        return events, cursor
+
+    def seek(self, timestamp):
+        # 返回指向 timestamp 之后第一个事件的游标，配合 page() 从该时刻向前翻
+        for segment in reversed(self.segments()):
+            with self.lock:
+                index = list(self.load_index(segment))
+            if not index or index[0][0] > timestamp:
+                continue
+            block = bisect_right([ts for ts, _ in index], timestamp) - 1
+            start = index[block][1]
+            if block + 1 < len(index):
+                end = index[block + 1][1]
+            else:
+                end = self.size if segment == self.segment else os.path.getsize(self.log_path(segment))
+            offset = start
+            for raw in self.read(segment, start, end).split(b'\n'):
+                try:
+                    if json.loads(raw)['ts'] > timestamp:
+                        break
+                except (ValueError, KeyError):
+                    pass
+                offset += len(raw) + 1
+            return segment, min(offset, end)
+        segments = self.segments()
+        return (segments[0], 0) if segments else None
+
+def normalize_domain(value):
+    # 接受域名、网址或带 *. 前缀的写法，返回小写 ASCII 域名；无效时返回 None
+    value = value.strip().lower()
+    if '://' in value:
+        value = value.split('://', 1)[1]
+    value = value.split('/', 1)[0].split(':', 1)[0].strip('.')
+    if value.startswith('*.'):
+        value = value[2:]
+    if not value.isascii():
+        try:
+            value = value.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    return value if DOMAIN_PATTERN.match(value) else None
+
+def parse_domain_list(text):
+    # 每行一个域名；也接受 hosts 格式（地址后跟多个域名）和 # 注释
+    domains = []
+    for line in text.splitlines():
+        tokens = line.split('#', 1)[0].split()
+        if len(tokens) > 1 and (':' in tokens[0] or tokens[0].replace('.', '').isdigit()):
+            tokens = tokens[1:]
+        for token in tokens:
+            domain = normalize_domain(token)
+            if domain is not None:
+                domains.append(domain)
+    return domains
+
+class DomainTrie:
+    # 按反转标签（com -> example -> www）建树：重复域名只存一次，共同后缀共享节点；
+    # 输出按反转标签排序，同一站点的域名相邻，输出稳定，便于判断托管段是否变化
+    END = ''
+
+    def __init__(self, domains=()):
+        self.root = {}
+        self.size = 0
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain):
+        node = self.root
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        if self.END in node:
+            return False
+        node[self.END] = domain
+        self.size += 1
+        return True
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        # 逐层展开节点，再按反转标签整体排序一次，比在每个节点上排序子标签快
+        names = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for label, child in node.items():
+                if label == self.END:
+                    names.append(child)
+                else:
+                    stack.append(child)
+        names.sort(key=lambda name: ' '.join(reversed(name.split('.'))))
+        return iter(names)
+
+def compile_domains(domains):
+    # hosts 不支持通配符：example.com 同时写入 www.example.com
+    trie = DomainTrie()
+    for value in domains:
+        domain = normalize_domain(value)
+        if domain is None:
+            continue
+        trie.add(domain)
+        if not domain.startswith('www.'):
+            trie.add('www.' + domain)
+    return tuple(trie)
+
+class HostsFileBlocker:
+    # 只改写 hosts 文件中由标记包围的托管段；内容未变化时不写盘，写入经临时文件 + 重命名原子替换
+    def __init__(self, path=HOSTS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.written = None
+
+    @staticmethod
+    def render(domains):
+        if not domains:
+            return ''
+        lines = [HOSTS_BEGIN, f"# managed by SupervisorApp ({len(domains)} names), do not edit"]
+        for offset in range(0, len(domains), HOSTS_NAMES_PER_LINE):
+            lines.append(f"{HOSTS_ADDRESS} {' '.join(domains[offset:offset + HOSTS_NAMES_PER_LINE])}")
+        lines.append(HOSTS_END)
+        return '\n'.join(lines)
+
+    @staticmethod
+    def split(text):
+        start = text.find(HOSTS_BEGIN)
+        if start < 0:
+            return text, '', ''
+        end = text.find(HOSTS_END, start)
+        end = len(text) if end < 0 else end + len(HOSTS_END)
+        return text[:start], text[start:end], text[end:]
+
+    def apply(self, domains):
+        # 返回 True 表示 hosts 文件被改写
+        block = self.render(domains)
+        with self.lock:
+            if block == self.written:
+                return False
+            try:
+                with open(self.path, 'rb') as f:
+                    text = f.read().decode('utf-8', 'surrogateescape')
+            except FileNotFoundError:
+                text = ''
+            newline = '\r\n' if '\r\n' in text else '\n'
+            before, current, after = self.split(text.replace('\r\n', '\n'))
+            if current == block:
+                self.written = block
+                return False
+            parts = [part for part in (before.rstrip('\n'), block, after.strip('\n')) if part]
+            content = '\n'.join(parts) + '\n' if parts else ''
+            self.write(content.replace('\n', newline).encode('utf-8', 'surrogateescape'))
+            self.written = block
+        if sys.platform == 'win32':
+            subprocess.run(["ipconfig", "/flushdns"], creationflags=NO_WINDOW, capture_output=True)
+        return True
+
+    def write(self, payload):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix='.supervisor_hosts.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                mode = os.stat(self.path).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(temp_path, mode)
+            if os.name == 'nt' and os.path.exists(self.path):
+                os.chmod(self.path, 0o666)
+            os.replace(temp_path, self.path)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+class SupervisionActions:
+    # 监督动作接口：执法核心只通过它关机、锁屏、提醒和通报拦截结果，平台实现与测试桩都实现它
+    def shutdown(self, item):
+        raise NotImplementedError
+
+    def lock(self, item):
+        raise NotImplementedError
+
+    def remind(self, item):
+        raise NotImplementedError
+
+    def beep(self):
+        raise NotImplementedError
+
+    def process_killed(self, name):
+        raise NotImplementedError
+
+class WindowsActions(SupervisionActions):
+    # on_remind / on_killed 由界面注入；无界面模式下提醒退化为提示音，拦截只打印
+    def __init__(self, on_remind=None, on_killed=None):
+        self.on_remind = on_remind
+        self.on_killed = on_killed
+
+    def shutdown(self, item):
+        subprocess.run(["shutdown", "/s", "/t", "60"])
+
+    def lock(self, item):
+        ctypes.windll.user32.LockWorkStation()
+
+    def remind(self, item):
+        if self.on_remind is not None:
+            self.on_remind(item)
+        else:
+            self.beep()
+
+    def beep(self):
+        import winsound
+        winsound.Beep(1000, 800)
+
+    def process_killed(self, name):
+        if self.on_killed is not None:
+            self.on_killed(name)
+        else:
+            print(f"已终止进程: {name}")
+
+class StubActions(SupervisionActions):
+    # 非 Windows 平台或测试时使用：不真正关机锁屏，只记录本应执行的动作
+    def __init__(self, echo=True, clock=SYSTEM_CLOCK):
+        self.echo = echo
+        self.clock = clock
+        self.log = []
+
+    def record(self, action, detail):
+        self.log.append((self.clock.now(), action, detail))
+        if self.echo:
+            print(f"[{action}] {detail}")
+
+    def shutdown(self, item):
+        self.record('关机', item['name'])
+
+    def lock(self, item):
+        self.record('锁定', item['name'])
+
+    def remind(self, item):
+        self.record('提醒', item['name'])
+
+    def beep(self):
+        self.record('提示音', '')
+
+    def process_killed(self, name):
+        self.record('终止进程', name)
+
+def create_default_actions():
+    return WindowsActions() if sys.platform == 'win32' else StubActions()
+
+CadenceDecision = namedtuple('CadenceDecision', ['at', 'interval', 'reason'])
+
+class CadencePolicy:
+    # 决定下一次进程扫描的间隔（None 表示等到下一个时段边界）：时段外不扫描；
+    # 时段刚开始与刚终止进程后加快，锁屏、用户离开或长时间没有拦截时逐步退避。最近的决策保留以供查看
+    def __init__(self, clock=SYSTEM_CLOCK, base=ENFORCEMENT_INTERVAL):
+        self.clock = clock
+        self.base = base
+        self.last_kill = None
+        self.decisions = deque(maxlen=CADENCE_HISTORY)
+
+    def record_kill(self):
+        self.last_kill = self.clock.time()
+
+    def decide(self, schedule, active, now, push, retries, locked=False, idle=0):
+        interval, reason = self.choose(schedule, active, now, push, retries, locked, idle)
+        decision = CadenceDecision(now.timestamp(), interval, reason)
+        self.decisions.append(decision)
+        CADENCE_DECISIONS.inc(reason=reason)
+        return decision
+
+    def choose(self, schedule, active, now, push, retries, locked, idle):
+        if not active:
+            return None, 'outside'
+        if locked:
+            return CADENCE_LOCKED_INTERVAL, 'locked'
+        if push and not retries:
+            # 推送模式下被终止的程序再次打开也会立即收到事件，不需要加快全表扫描
+            return None, 'push'
+        since_kill = None if self.last_kill is None else now.timestamp() - self.last_kill
+        if since_kill is not None and since_kill < CADENCE_KILL_WINDOW:
+            # 被终止的程序往往很快被再次打开
+            return CADENCE_FAST_INTERVAL, 'after_kill'
+        since_start = min((seconds_of_day(now) - schedule.spans[id(item)][1]) % DAY_SECONDS for item in active)
+        if since_start < CADENCE_START_WINDOW:
+            return CADENCE_FAST_INTERVAL, 'period_start'
+        if idle >= CADENCE_IDLE_AFTER:
+            return CADENCE_IDLE_INTERVAL, 'idle'
+        quiet = since_start if since_kill is None else min(since_start, since_kill)
+        if quiet >= CADENCE_QUIET_AFTER:
+            return min(self.base * 2 ** int(quiet // CADENCE_QUIET_AFTER), CADENCE_MAX_INTERVAL), 'quiet'
+        return self.base, 'normal'
+
+    def export(self, limit=CADENCE_EXPORT_LIMIT):
+        return {
+            'last_kill': self.last_kill,
+            'decisions': [{'at': datetime.fromtimestamp(decision.at).isoformat(timespec='seconds'),
+                           'interval': decision.interval, 'reason': decision.reason}
+                          for decision in list(self.decisions)[-limit:]],
+        }
+
+ConfigSnapshot = namedtuple('ConfigSnapshot', ['version', 'items', 'global_blacklist', 'schedule', 'matchers',
+                                               'domains', 'signature'])
+
+class EnforcementEngine:
+    # 与界面无关的执法核心：编译规则、按时段边沿执行动作、拦截黑名单进程。
+    # 所有检查都读取 apply 时生成的不可变快照，界面编辑列表不会影响进行中的执法
+    def __init__(self, actions, config_path=CONFIG_FILE, state_path=ACTION_STATE_FILE, metrics_path=METRICS_FILE,
+                 usage_dir=USAGE_DIR, audit_dir=AUDIT_DIR, hash_path=EXE_HASH_FILE, hosts_path=HOSTS_FILE,
+                 clock=SYSTEM_CLOCK, runtime=None):
+        self.actions = actions
+        self.clock = clock
+        self.config = ConfigStore(config_path)
+        self.tracker = ActionTracker(state_path, clock)
+        self.metrics_store = ConfigStore(metrics_path, readonly=False)
+        self.metrics_server = None
+        self.usage = UsageLog(usage_dir, clock=clock)
+        self.audit = AuditLog(audit_dir, clock=clock)
+        self.hosts = HostsFileBlocker(hosts_path)
+        self.domain_state = None
+        self.domain_cache = {}
+        self.save_lock = threading.Lock()
+        self.save_sequence = 0
+        self.pending_save = None
+        self.snapshot = self.build_snapshot([], [])
+        self.scanner = PROCESS_SCANNER
+        self.scanned_generation = None
+        self.resync = False
+        self.enforced_matchers = []
+        self.kill_retries = set()
+        self.tree_killer = ProcessTreeKiller()
+        self.identities = ExecutableIdentityCache(hash_path, on_hashed=self.on_executable_hashed)
+        self.cadence = CadencePolicy(clock)
+        self.session_state = session_state
+        self.enforcement_lock = threading.Lock()
+        self.process_events = PollingProcessEventSource()
+        self.runtime = runtime or AsyncRuntime(clock=clock)
+
+    def load(self):
+        data = self.config.load()
+        self.apply(data.get('items', []), data.get('global_blacklist', []))
+        return data
+
+    @staticmethod
+    def freeze_item(item):
+        # 只复制到条目内的列表一级；域名列表只含字符串，转成元组即可，避免对十万条域名整体深拷贝
+        item = dict(item)
+        if 'blacklist' in item:
+            item['blacklist'] = [dict(entry) for entry in item['blacklist']]
+        if 'domains' in item:
+            item['domains'] = tuple(item['domains'])
+        return item
+
+    def freeze(self, items, global_blacklist):
+        return tuple(self.freeze_item(item) for item in items), tuple(dict(entry) for entry in global_blacklist)
+
+    def build_snapshot(self, items, global_blacklist):
+        items, global_blacklist = self.freeze(items, global_blacklist)
+        return ConfigSnapshot(self.config.version, items, global_blacklist, ScheduleIndex(items),
+                              self.compile_matchers(items, global_blacklist),
+                              self.compile_item_domains(items),
+                              self.config_signature(items, global_blacklist))
+
+    def apply(self, items, global_blacklist):
+        # 复制后整体替换引用：执法任务每轮只取一次 self.snapshot，读到的要么是旧配置要么是新配置
+        self.snapshot = self.build_snapshot(items, global_blacklist)
+        self.wake_monitors()
+
+    def save(self, items, global_blacklist, **extra):
+        # 界面线程只做浅层复制；编译规则、域名与写盘在线程池上进行，大域名列表不会卡住界面
+        items, global_blacklist = self.freeze(items, global_blacklist)
+        # 序号只由调用 save 的界面线程递增，不能等待 save_lock，否则会被进行中的编译卡住
+        self.save_sequence += 1
+        sequence = self.save_sequence
+        self.pending_save = self.runtime.submit_blocking(self.commit, sequence, items, global_blacklist, extra)
+
+    def commit(self, sequence, items, global_blacklist, extra):
+        with self.save_lock:
+            # 连续保存时只提交最新的一次
+            if sequence != self.save_sequence:
+                return
+            before = self.snapshot.signature
+            # 先编译再写盘：规则无法编译时不落盘，避免坏配置导致每次启动都崩溃
+            try:
+                snapshot = self.build_snapshot(items, global_blacklist)
+            except Exception as e:
+                print(f"配置编译失败，未保存: {str(e)}")
+                return
+            self.config.adopt(items=list(items), global_blacklist=list(global_blacklist), **extra)
+            self.snapshot = snapshot._replace(version=self.config.version)
+        self.wake_monitors()
+        changes = self.describe_changes(before, self.snapshot.signature)
+        if changes:
+            self.audit.record('config', **changes)
+
+    def wait_saved(self, timeout=10):
+        pending = self.pending_save
+        if pending is not None:
+            try:
+                pending.result(timeout)
+            except Exception as e:
+                print(f"等待配置保存失败: {str(e)}")
+
+    @staticmethod
+    def config_signature(items, global_blacklist):
+        return ({ActionTracker.item_key(item): json.dumps(item, sort_keys=True, ensure_ascii=False) for item in items},
+                {entry.get('name', ''): bool(entry.get('active')) for entry in global_blacklist})
+
+    @staticmethod
+    def describe_changes(before, after):
+        (old_items, old_blacklist), (new_items, new_blacklist) = before, after
+        changes = {
+            'items_added': sorted(new_items.keys() - old_items.keys()),
+            'items_removed': sorted(old_items.keys() - new_items.keys()),
+            'items_changed': sorted(key for key in new_items.keys() & old_items.keys()
+                                    if new_items[key] != old_items[key]),
+            'blacklist_added': sorted(new_blacklist.keys() - old_blacklist.keys()),
+            'blacklist_removed': sorted(old_blacklist.keys() - new_blacklist.keys()),
+            'blacklist_toggled': sorted(name for name in new_blacklist.keys() & old_blacklist.keys()
+                                        if new_blacklist[name] != old_blacklist[name]),
+        }
+        return {key: value for key, value in changes.items() if value}
+
+    def start(self, metrics_port=METRICS_PORT):
+        self.identities.load()
+        self.process_events = create_process_event_source(self.on_process_started, self.on_events_lost,
+                                                          self.on_events_failed)
+        if metrics_port:
+            self.metrics_server = start_metrics_server(METRICS, metrics_port, {'/cadence': self.cadence.export})
+        self.runtime.call_at('metrics_dump', self.clock.time() + METRICS_DUMP_INTERVAL, self.dump_metrics)
+        try:
+            self.audit.start()
+        except OSError as e:
+            print(f"无法打开审计日志: {str(e)}")
+        try:
+            self.usage.open()
+            self.runtime.call_at('usage_sample', self.clock.time() + self.usage.interval, self.sample_usage)
+        except OSError as e:
+            print(f"无法打开用量记录: {str(e)}")
+        self.runtime.start()
+
+    def stop(self):
+        self.wait_saved()
+        # 先停事件源：线程池关闭后再收到的启动事件会因无法提交任务而报错
+        self.process_events.stop()
+        self.runtime.stop()
+        self.identities.stop()
+        self.flush()
+
+    async def dump_metrics(self):
+        try:
+            await self.runtime.run_blocking(self.write_metrics)
+        finally:
+            self.runtime.call_at('metrics_dump', self.clock.time() + METRICS_DUMP_INTERVAL, self.dump_metrics)
+
+    def write_metrics(self):
+        self.metrics_store.update(**METRICS.snapshot(), cadence=self.cadence.export())
+        self.metrics_store.flush()
+
+    def flush(self):
+        self.wait_saved()
+        self.config.flush()
+        self.tracker.flush()
+        self.write_metrics()
+        self.audit.flush()
+        self.identities.flush()
+
+    def is_restricted(self, moment):
+        return self.snapshot.schedule.is_restricted(moment)
+
+    def restricted_keys(self, moment):
+        # 界面持有的是自己的列表，按 item_key 而不是对象身份对应快照中的事项
+        return {ActionTracker.item_key(item) for item in self.snapshot.schedule.restricted_items(moment)}
+
+    def is_item_restricted(self, item, moment):
+        if not item['active']:
+            return False
+        return ActionTracker.item_key(item) in self.restricted_keys(moment)
+
+    def compile_item_domains(self, items):
+        # 保存其他设置时域名列表通常不变，按列表内容复用上次的编译结果
+        compiled = {}
+        domains = {}
+        for item in items:
+            if item.get('domains'):
+                key = tuple(item['domains'])
+                if key not in compiled:
+                    compiled[key] = self.domain_cache.get(key) or compile_domains(key)
+                domains[id(item)] = compiled[key]
+        self.domain_cache = compiled
+        return domains
+
+    @staticmethod
+    def compile_matchers(items, global_blacklist):
+        matchers = {None: BlacklistMatcher(global_blacklist)}
+        for item in items:
+            if item.get('enable_blacklist', False):
+                matchers[id(item)] = BlacklistMatcher(item.get('blacklist', []))
+        return matchers
+
+    def matcher_for(self, item, matchers):
+        if item.get('enable_blacklist', False):
+            return matchers.get(id(item))
+        return matchers.get(None)
+
+    def wake_monitors(self):
+        now = self.clock.time()
+        self.runtime.call_at('time_monitor', now, self.time_monitor)
+        self.runtime.call_at('process_monitor', now, self.process_monitor)
+
+    def schedule_next_pass(self, snapshot, key, callback, now, live_interval=None):
+        next_run = None
+        offset = snapshot.schedule.seconds_until_boundary(now)
+        if offset is not None:
+            next_run = self.clock.time() + offset
+        if live_interval is not None:
+            next_run = min(next_run or float('inf'), self.clock.time() + live_interval)
+        if next_run is None:
+            self.runtime.cancel(key)
+        else:
+            self.runtime.call_at(key, next_run, callback)
+
+    async def sample_usage(self):
+        try:
+            await self.runtime.run_blocking(self.record_usage, self.snapshot)
+        finally:
+            self.runtime.call_at('usage_sample', self.clock.time() + self.usage.interval, self.sample_usage)
+
+    def record_usage(self, snapshot):
+        # 复用共享进程表解析前台进程，按当前所在的监督时段归类
+        pid = foreground_pid()
+        if not pid:
+            return
+        entry = self.scanner.get(pid) or self.scanner.track(pid)
+        if entry is not None and entry.name:
+            now = self.clock.now()
+            active = snapshot.schedule.active_items(now)
+            item = ActionTracker.item_key(active[0]) if active else ''
+            try:
+                self.usage.append(now.timestamp(), entry.name.lower(), item)
+            except OSError as e:
+                print(f"写入用量记录失败: {str(e)}")
+
+    async def time_monitor(self):
+        now = self.clock.now()
+        snapshot = self.snapshot
+        schedule = snapshot.schedule
+        # 本轮出错时也要安排下一轮，否则该监控要等到下次保存配置才恢复；出错后按常规间隔重试
+        repeat = ENFORCEMENT_INTERVAL
+        try:
+            for item, _, _ in schedule.spans.values():
+                if self.tracker.advance(item, schedule.phase(item, now), now):
+                    await self.runtime.run_blocking(self.execute_supervision, item)
+                    self.tracker.mark_fired(item, now)
+            await self.runtime.run_blocking(self.apply_domains, snapshot, now)
+            repeat = self.tracker.seconds_until_repeat(schedule.active_items(now), now)
+        finally:
+            self.schedule_next_pass(snapshot, 'time_monitor', self.time_monitor, now, repeat)
+
+    def apply_domains(self, snapshot, now):
+        # 执行期内的监督项目的域名合并写入 hosts 托管段，时段结束时移除；启动时顺带清理上次遗留的托管段
+        keys = tuple(id(item) for item in snapshot.schedule.active_items(now) if id(item) in snapshot.domains)
+        if self.domain_state is not None and self.domain_state[0] is snapshot and self.domain_state[1] == keys:
+            return
+        lists = [snapshot.domains[key] for key in keys]
+        domains = lists[0] if len(lists) == 1 else tuple(DomainTrie(domain for names in lists for domain in names))
+        try:
+            changed = self.hosts.apply(domains)
+        except OSError as e:
+            print(f"更新 hosts 文件失败: {str(e)}")
+            return
+        self.domain_state = (snapshot, keys)
+        if changed:
+            self.audit.record('hosts', domains=len(domains))
+
+    def execute_supervision(self, item):
+        ALERTS.inc(action=item['action'])
+        self.audit.record('action', item=item['name'], action=item['action'],
+                          start=item['start'], end=item['end'])
+        if item['action'] == '关机':
+            self.actions.shutdown(item)
+        elif item['action'] == '锁定':
+            self.actions.lock(item)
+        elif item['action'] == '仅启用黑名单（不弹窗）':
+            pass
+        else:
+            self.actions.remind(item)
+
+    async def process_monitor(self):
+        now = self.clock.now()
+        snapshot = self.snapshot
+        active = snapshot.schedule.active_items(now)
+        live_matchers = []
+        for item in active:
+            matcher = self.matcher_for(item, snapshot.matchers)
+            if matcher and matcher not in live_matchers:
+                live_matchers.append(matcher)
+        interval = ENFORCEMENT_INTERVAL
+        try:
+            await self.runtime.run_blocking(self.enforce, live_matchers)
+            # 事件源为推送模式时，时段内只在规则变化时全表核对一次，除非有待重试的进程
+            locked, idle = await self.runtime.run_blocking(self.session_state) if active else (False, 0)
+            decision = self.cadence.decide(snapshot.schedule, active, now, self.process_events.push,
+                                           bool(self.kill_retries), locked, idle)
+            interval = decision.interval
+        finally:
+            self.schedule_next_pass(snapshot, 'process_monitor', self.process_monitor, now, interval)
+
+    def enforce(self, live_matchers):
+        with self.enforcement_lock:
+            if live_matchers:
+                with SCAN_SECONDS.time():
+                    self.kill_blacklist_processes(live_matchers, self.collect_candidates(live_matchers))
+            self.enforced_matchers = live_matchers
+
+    def on_process_started(self, pid):
+        # 由事件源线程调用：解析与终止进程交给线程池，事件源继续读取下一条事件
+        if self.enforced_matchers:
+            self.runtime.submit_blocking(self.enforce_new_process, pid)
+
+    def on_events_lost(self):
+        # 事件源丢了事件：下一轮不按增量而是全表核对
+        self.resync = True
+        if self.enforced_matchers:
+            self.runtime.call_at('process_monitor', self.clock.time(), self.process_monitor)
+
+    def on_events_failed(self, source):
+        # 事件源线程已退出：改用轮询并立即全表核对，节奏策略随之恢复定时扫描
+        if source is not self.process_events:
+            return
+        print(f"进程事件源 {source.name} 失效，改用轮询")
+        polling = PollingProcessEventSource()
+        polling.start(self.on_process_started)
+        self.process_events = polling
+        self.on_events_lost()
+
+    def on_executable_hashed(self, path):
+        # 摘要算完或确认不可读后立即补跑一轮；等待摘要的进程已记在 kill_retries 中，
+        # 新摘要可能命中规则，不可读的文件则让这些进程移出重试
+        if self.enforced_matchers:
+            self.runtime.call_at('process_monitor', self.clock.time(), self.process_monitor)
+
+    def enforce_new_process(self, pid):
+        with self.enforcement_lock:
+            matchers = self.enforced_matchers
+            if not matchers:
+                return
+            entry = self.scanner.track(pid)
+            if entry is not None:
+                self.kill_blacklist_processes(matchers, [entry])
+
+    def collect_candidates(self, live_matchers):
+        generation = self.scanner.refresh(max_age=1, verify=not self.process_events.push)
+        rules_changed = (len(live_matchers) != len(self.enforced_matchers) or
+                         any(a is not b for a, b in zip(live_matchers, self.enforced_matchers)))
+        resync, self.resync = self.resync, False
+        arrived = None if rules_changed or resync else self.scanner.arrivals_since(self.scanned_generation)
+        self.scanned_generation = generation
+        if arrived is None:
+            return self.scanner.snapshot()
+        retries = [self.scanner.get(pid) for pid in self.kill_retries]
+        self.kill_retries = {entry.pid for entry in retries if entry is not None}
+        return arrived + [entry for entry in retries if entry is not None]
+
+    def kill_blacklist_processes(self, matchers, candidates):
+        PROCESSES_EXAMINED.inc(len(candidates))
+        roots = {}
+        identity_matchers = [matcher for matcher in matchers if matcher.by_identity]
+        for entry in candidates:
+            if not entry.name:
+                continue
+            matcher = next((matcher for matcher in matchers if matcher.matches(entry.name)), None)
+            identity = None
+            if matcher is None and identity_matchers and entry.exe:
+                identity = self.identities.lookup(entry.exe)
+                if identity is IDENTITY_PENDING:
+                    self.kill_retries.add(entry.pid)
+                    continue
+                if identity is IDENTITY_FAILED:
+                    self.kill_retries.discard(entry.pid)
+                    continue
+                matcher = next((matcher for matcher in identity_matchers if matcher.identity_rule(identity)), None)
+            if matcher is None:
+                self.kill_retries.discard(entry.pid)
+                continue
+            try:
+                root = self.tree_killer.find_root(self.scanner.process(entry), matcher)
+            except psutil.NoSuchProcess:
+                # pid 已被新进程复用时，下一轮按重试核对新进程
+                replacement = self.scanner.get(entry.pid)
+                if replacement is not None and replacement != entry:
+                    self.kill_retries.add(entry.pid)
+                else:
+                    self.kill_retries.discard(entry.pid)
+                continue
+            except psutil.Error:
+                self.kill_retries.add(entry.pid)
+                continue
+            # 同一棵树内多个命中的进程只按最外层的根处理一次
+            roots.setdefault(root.pid, (root, entry, matcher, identity))
+        if not roots:
+            return
+        trees, survivors = self.tree_killer.terminate([root for root, _, _, _ in roots.values()])
+        for root, entry, matcher, identity in roots.values():
+            if root.pid in survivors:
+                self.kill_retries.add(entry.pid)
+                continue
+            self.kill_retries.discard(entry.pid)
+            killed = [pid for pid in trees.get(root.pid, ()) if pid not in survivors]
+            self.cadence.record_kill()
+            rule = matcher.identity_rule(identity) if identity else matcher.rule_for(entry.name)
+            KILLS.inc(len(killed), rule=rule)
+            self.audit.record('kill', name=entry.name.lower(), pid=entry.pid, rule=rule, processes=len(killed))
+            SPAWN_TO_KILL_SECONDS.observe(max(0.0, self.clock.time() - entry.create_time))
+            self.actions.process_killed(entry.name.lower())
+
+def run_headless(actions=None):
+    # 无界面运行执法核心：只读取配置并执行，配置需由界面或手工编辑生成
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    engine = EnforcementEngine(actions or create_default_actions())
+    try:
+        engine.load()
+    except FileNotFoundError:
+        print(f"未找到配置文件 {engine.config.path}，以空配置运行")
+        engine.apply([], [])
+    engine.start()
+    print(f"执法核心已启动：{len(engine.snapshot.items)} 个监督项目，"
+          f"进程事件源 {type(engine.process_events).__name__}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+
+if __name__ == "__main__":
+    run_headless()
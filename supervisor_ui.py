@@ -0,0 +1,985 @@
+# -*- coding: utf-8 -*-
+# 托盘图标与 Tk 界面：主程序在执法循环启动之后才导入本模块，守护进程与服务路径不会加载它
+import os
+import sys
+import math
+import random
+import threading
+import subprocess
+from datetime import date, datetime, timedelta
+from tkinter import *
+from tkinter import ttk, messagebox, simpledialog, filedialog
+import pystray
+from PIL import Image
+
+from supervisor_core import (
+    CONFIG_DIR, parse_clock, seconds_of_day, parse_domain_list, ConfigStore,
+    ActionTracker, UsageLog,
+)
+
+ALERT_DURATION = 10
+WINDOW_POSITIONS_FILE = os.path.join(CONFIG_DIR, 'window_positions.json')
+GEOMETRY_FLUSH_DELAY = 1.0
+AUDIT_KIND_NAMES = {'kill': "终止进程", 'action': "监督动作", 'config': "配置修改", 'restart': "守护重启",
+                    'hosts': "网站屏蔽"}
+AUDIT_CONFIG_LABELS = {
+    'items_added': "新增时段", 'items_removed': "删除时段", 'items_changed': "修改时段",
+    'blacklist_added': "新增黑名单", 'blacklist_removed': "删除黑名单", 'blacklist_toggled': "启用/停用黑名单",
+}
+TOMATO_PHASE_NAMES = {'focus': "专注", 'short_break': "短休息", 'long_break': "长休息"}
+BLACKLIST_PROMPT = ("输入要阻止的进程名称（如chrome.exe）：\n支持通配符（如*game*.exe），以 re: 开头则按正则匹配\n"
+                    "以 sha256: 开头按程序文件摘要匹配，以 publisher: 开头按发行者匹配（改名无法绕过）")
+DOMAIN_PROMPT = "输入要屏蔽的网站域名（如bilibili.com，可用空格分隔多个）：\n会同时屏蔽 www. 前缀"
+
+
+class ChecklistView:
+    # 基于 Treeview 的勾选列表：Tk 只绘制可见行，刷新时逐行比对，只更新发生变化的行
+    CHECKED = "☑"
+    UNCHECKED = "☐"
+
+    def __init__(self, parent, on_toggle, on_activate=None, height=6):
+        self.on_toggle = on_toggle
+        self.on_activate = on_activate
+        self.rows = []
+        frame = ttk.Frame(parent)
+        frame.pack(fill=BOTH, expand=True, padx=10)
+        self.tree = ttk.Treeview(frame, columns=('active', 'label'), show='', selectmode='browse', height=height)
+        self.tree.column('active', width=30, stretch=False, anchor=CENTER)
+        self.tree.column('label', stretch=True)
+        self.tree.tag_configure('locked', foreground='gray')
+        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree.bind('<Button-1>', self.on_click)
+        self.tree.bind('<space>', lambda e: self.with_selection(self.on_toggle))
+        if on_activate is not None:
+            self.tree.bind('<Double-1>', lambda e: self.with_selection(self.on_activate))
+
+    def exists(self):
+        try:
+            return bool(self.tree.winfo_exists())
+        except TclError:
+            return False
+
+    def update(self, rows):
+        # rows: [(是否启用, 显示文本, 是否锁定), ...]
+        cached = []
+        for index, (active, label, locked) in enumerate(rows):
+            row = ((self.CHECKED if active else self.UNCHECKED, label), ('locked',) if locked else ())
+            if index >= len(self.rows):
+                self.tree.insert('', END, iid=str(index), values=row[0], tags=row[1])
+            elif self.rows[index] != row:
+                self.tree.item(str(index), values=row[0], tags=row[1])
+            cached.append(row)
+        for index in range(len(rows), len(self.rows)):
+            self.tree.delete(str(index))
+        self.rows = cached
+
+    def on_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        if iid and self.tree.identify_column(event.x) == '#1':
+            self.tree.selection_set(iid)
+            self.on_toggle(int(iid))
+            return 'break'
+
+    def with_selection(self, command):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showinfo("提示", "请先选择一项")
+            return
+        command(int(selection[0]))
+
+class SupervisorApp:
+    # 执法核心、番茄钟与通知队列由主程序创建并先行启动；config 为已加载的配置，首次运行时为 None
+    def __init__(self, engine, tomato, notifications, config, script_path, instance_lock):
+        self.engine = engine
+        self.tomato = tomato
+        self.notifications = notifications
+        self.script_path = script_path
+        self.instance_lock = instance_lock
+        self.root = None
+        self.tray_icon = None
+        self.supervision_items = []
+        self.global_blacklist = []
+        self.time_label = None
+        self.tomato_refresh_job = None
+        self.supervision_view = None
+        self.global_blacklist_view = None
+        self.window_positions = ConfigStore(WINDOW_POSITIONS_FILE, delay=GEOMETRY_FLUSH_DELAY, readonly=False)
+        if config is None:
+            self.save_config()
+        else:
+            self.load_config(config)
+
+        self.root = Tk()
+        self.root.withdraw()
+        self.notifications.start(self.root)
+        self.create_tray_icon()
+        self.load_window_positions()
+
+    def create_tray_icon(self):
+        menu_items = [
+            pystray.MenuItem('打开控制面板', self.show_control_panel),
+            pystray.Menu.SEPARATOR,
+            pystray.MenuItem('番茄工作法', self.show_tomato_panel),
+            pystray.MenuItem('使用统计', self.show_usage_panel),
+            pystray.MenuItem('操作记录', self.show_audit_panel),
+            pystray.MenuItem('开机自启动', self.toggle_autorun,
+                           checked=lambda item: self.is_autorun_enabled(),
+                           enabled=lambda item: not self.is_in_restricted_period()),  # 修复：接受一个参数
+            pystray.MenuItem('开启服务', self.toggle_service),
+            pystray.MenuItem('退出', self.quit_app)
+        ]
+        image = Image.new('RGB', (64, 64), 'white')
+        self.tray_icon = pystray.Icon("supervisor", image, "自律监督程序", pystray.Menu(*menu_items))
+        threading.Thread(target=self.tray_icon.run, daemon=True).start()
+
+    def generate_monitor_script(self):
+        script_content = """
+import os
+import time
+import psutil
+import subprocess
+
+main_program_path = r'{}'
+instance_lock = r'{}'
+watched = None
+
+def is_program_running():
+    # 只核对实例锁文件里记录的那一个进程，不做全表扫描
+    global watched
+    if watched is not None:
+        try:
+            if psutil.Process(watched[0]).create_time() == watched[1]:
+                return True
+        except psutil.Error:
+            pass
+        watched = None
+    try:
+        with open(instance_lock, 'r') as f:
+            proc = psutil.Process(int(f.read().strip()))
+        if main_program_path in (proc.cmdline() or []):
+            watched = (proc.pid, proc.create_time())
+            return True
+    except (OSError, ValueError, psutil.Error):
+        pass
+    return False
+
+def start_program():
+    return psutil.Popen([main_program_path], creationflags=subprocess.CREATE_NO_WINDOW)
+
+def main():
+    # 持有主程序进程句柄阻塞等待，退出后立即重启；连续快速退出时指数退避
+    delay = 0
+    while True:
+        started = time.monotonic()
+        try:
+            if is_program_running():
+                proc = psutil.Process(watched[0])
+            else:
+                proc = start_program()
+            proc.wait()
+        except (OSError, psutil.Error):
+            pass
+        if time.monotonic() - started >= 30:
+            delay = 0
+        else:
+            delay = min(max(delay * 2, 1), 60)
+        time.sleep(delay)
+
+if __name__ == "__main__":
+    main()
+""".format(self.script_path, self.instance_lock)
+
+        script_path = os.path.join(os.path.dirname(self.script_path), 'monitor_script.py')
+        try:
+            with open(script_path, 'w', encoding='utf-8') as f:
+                f.write(script_content)
+            print(f"监控脚本已生成: {script_path}")
+            return script_path
+        except Exception as e:
+            print(f"生成监控脚本失败: {e}")
+            return None
+
+    def install_pyinstaller(self):
+        try:
+            import pyinstaller
+        except ImportError:
+            subprocess.run([sys.executable, '-m', 'pip', 'install', 'pyinstaller'], check=True)
+
+    def pack_to_exe(self, script_path):
+        try:
+            dist_dir = os.path.join(os.path.dirname(script_path), 'dist')
+            exe_path = os.path.join(dist_dir, 'monitor_script.exe')
+            
+            if os.path.exists(exe_path):
+                print(f"可执行文件已存在: {exe_path}")
+                return exe_path
+            
+            try:
+                import PyInstaller
+            except ImportError:
+                print("正在安装PyInstaller...")
+                subprocess.run([sys.executable, '-m', 'pip', 'install', 'pyinstaller'], check=True)
+            
+            print(f"正在打包: {script_path}")
+            subprocess.run([
+                sys.executable, '-m', 'PyInstaller',
+                '--onefile', '--noconsole',
+                '--distpath', dist_dir,
+                script_path
+            ], check=True)
+            
+            if os.path.exists(exe_path):
+                print(f"可执行文件生成成功: {exe_path}")
+                return exe_path
+            else:
+                print(f"可执行文件未生成: {exe_path}")
+                return None
+        except subprocess.CalledProcessError as e:
+            print(f"打包失败: {e.stderr}")
+            messagebox.showerror("错误", f"打包失败: {str(e)}")
+            return None
+
+    def toggle_service(self):
+        import pywintypes
+        import win32serviceutil
+        try:
+            if self.is_service_running():
+                win32serviceutil.StopService('SupervisorService')
+            else:
+                if not self.is_service_installed():
+                    self.install_pyinstaller()
+                    
+                    script_path = self.generate_monitor_script()
+                    if not script_path:
+                        messagebox.showerror("错误", "监控脚本生成失败")
+                        return
+                    
+                    exe_path = self.pack_to_exe(script_path)
+                    if not exe_path or not os.path.exists(exe_path):
+                        messagebox.showerror("错误", f"生成的可执行文件不存在: {exe_path}")
+                        return
+                    
+                    print(f"可执行文件路径: {exe_path}")
+                    try:
+                        result = subprocess.run([
+                            'sc', 'create', 'SupervisorService',
+                            'binPath=', exe_path,
+                            'start=', 'auto',
+                            'DisplayName=', 'Supervisor Service'
+                        ], capture_output=True, text=True, check=True)
+                        print(f"服务创建输出: {result.stdout}")
+                    except subprocess.CalledProcessError as e:
+                        print(f"服务创建失败: {e.stderr}")
+                        raise
+                    
+                try:
+                    win32serviceutil.StartService('SupervisorService')
+                    print("服务启动成功")
+                except pywintypes.error as e:
+                    print(f"服务启动失败: {e}")
+                    messagebox.showerror("错误", f"服务启动失败: {e}")
+        except subprocess.CalledProcessError as e:
+            messagebox.showerror("错误", f"服务创建失败: {str(e)}")
+        except Exception as e:
+            messagebox.showerror("错误", f"服务操作失败: {str(e)}")
+
+    def is_service_installed(self):
+        try:
+            result = subprocess.run(
+                ['sc', 'query', 'SupervisorService'],
+                capture_output=True, text=True
+            )
+            return "SERVICE_NAME: SupervisorService" in result.stdout
+        except subprocess.CalledProcessError:
+            return False
+
+    def is_service_running(self):
+        try:
+            import win32service
+            import win32serviceutil
+            status = win32serviceutil.QueryServiceStatus('SupervisorService')[1]
+            return status == win32service.SERVICE_RUNNING
+        except:
+            return False
+
+    def create_window(self, title, geometry=None, parent=None):
+        window = Toplevel(parent)
+        window.title(title)
+        saved = self.window_positions.data.get(title)
+        if saved or geometry:
+            window.geometry(saved or geometry)
+
+        def on_configure(event):
+            # 子控件的 <Configure> 也会冒泡到 Toplevel，只记录窗口本身
+            if event.widget is window:
+                self.track_window_position(window, title)
+        window.bind("<Configure>", on_configure)
+
+        def close():
+            self.track_window_position(window, title)
+            self.window_positions.flush()
+            window.destroy()
+        window.protocol("WM_DELETE_WINDOW", close)
+        return window
+
+    def track_window_position(self, window, title):
+        geometry = window.geometry()
+        if self.window_positions.data.get(title) != geometry:
+            self.window_positions.update(**{title: geometry})
+
+    def save_window_positions(self):
+        self.window_positions.flush()
+
+    def load_window_positions(self):
+        try:
+            self.window_positions.load()
+        except (OSError, ValueError):
+            pass
+
+    def show_tomato_panel(self):
+        tomato_win = self.create_window("番茄钟")
+        
+        self.tomato_phase_label = ttk.Label(tomato_win, font=("Arial", 12))
+        self.tomato_phase_label.pack(pady=(15, 0))
+        self.time_label = ttk.Label(tomato_win, font=("Arial", 24))
+        self.time_label.pack(pady=10)
+        self.tomato_stats_label = ttk.Label(tomato_win)
+        self.tomato_stats_label.pack()
+        
+        btn_frame = ttk.Frame(tomato_win)
+        btn_frame.pack(pady=10)
+        
+        ttk.Button(btn_frame, text="开始", command=self.start_tomato).grid(row=0, column=0, padx=5)
+        ttk.Button(btn_frame, text="暂停", command=self.pause_tomato).grid(row=0, column=1, padx=5)
+        ttk.Button(btn_frame, text="重置", command=self.reset_tomato).grid(row=0, column=2, padx=5)
+        ttk.Button(btn_frame, text="设置", command=self.set_tomato_time).grid(row=0, column=3, padx=5)
+        self.refresh_tomato_panel()
+
+    def format_time(self):
+        mins, secs = divmod(math.ceil(self.tomato.remaining()), 60)
+        return f"{mins:02d}:{secs:02d}"
+
+    def set_tomato_time(self):
+        mins = simpledialog.askinteger("设置时间", "请输入专注时长（分钟）：", initialvalue=self.tomato.durations['focus'] // 60)
+        if mins and 1 <= mins <= 120:
+            break_mins = simpledialog.askinteger("设置时间", "请输入短休息时长（分钟）：",
+                                                 initialvalue=self.tomato.durations['short_break'] // 60)
+            if break_mins and 1 <= break_mins <= 60:
+                self.tomato.configure(short_break=break_mins * 60)
+            self.tomato.configure(focus=mins * 60)
+            self.save_config()
+            self.reset_tomato()
+
+    def start_tomato(self):
+        self.tomato.start()
+        self.refresh_tomato_panel()
+
+    def pause_tomato(self):
+        self.tomato.pause()
+        self.refresh_tomato_panel()
+
+    def reset_tomato(self):
+        self.tomato.reset()
+        self.refresh_tomato_panel()
+
+    def refresh_tomato_panel(self):
+        # 面板只负责显示：计时由 TomatoTimer 完成，这里每次对齐到下一个整秒刷新
+        if self.tomato_refresh_job is not None:
+            self.root.after_cancel(self.tomato_refresh_job)
+            self.tomato_refresh_job = None
+        if self.time_label is None or not self.time_label.winfo_exists():
+            self.time_label = None
+            return
+        state = self.tomato.state()
+        phase = TOMATO_PHASE_NAMES[self.tomato.phase]
+        self.tomato_phase_label.config(text=phase + ("（已暂停）" if state == 'paused' else ""))
+        self.time_label.config(text=self.format_time())
+        self.tomato_stats_label.config(text=f"今日完成 {self.tomato.completed_today()} 个番茄")
+        if state == 'running':
+            delay = int(self.tomato.remaining() % 1 * 1000) + 20
+            self.tomato_refresh_job = self.root.after(delay, self.refresh_tomato_panel)
+
+    def tomato_finished(self, finished, next_phase):
+        self.engine.actions.beep()
+        if finished == 'focus':
+            message = f"专注时段结束！点击开始进入{TOMATO_PHASE_NAMES[next_phase]}"
+        else:
+            message = "休息结束，点击开始下一个番茄"
+        self.show_alert("完成", message)
+        self.refresh_tomato_panel()
+
+    def load_config(self, data):
+        # 界面编辑自己的列表，保存时由执法核心生成新的配置快照
+        self.supervision_items = data.get('items', [])
+        self.global_blacklist = data.get('global_blacklist', [])
+        self.tomato.configure(focus=data.get('tomato_duration', 1500),
+                              short_break=data.get('tomato_break', 300),
+                              long_break=data.get('tomato_long_break', 900))
+
+    def save_config(self):
+        self.engine.save(
+            self.supervision_items,
+            self.global_blacklist,
+            tomato_duration=self.tomato.durations['focus'],
+            tomato_break=self.tomato.durations['short_break'],
+            tomato_long_break=self.tomato.durations['long_break']
+        )
+
+    def is_autorun_enabled(self):
+        try:
+            import winreg
+            key = winreg.OpenKey(
+                winreg.HKEY_CURRENT_USER,
+                r"Software\Microsoft\Windows\CurrentVersion\Run",
+                0, winreg.KEY_READ
+            )
+            value, _ = winreg.QueryValueEx(key, "SupervisorApp")
+            winreg.CloseKey(key)
+            return True
+        except:
+            return False
+
+    def toggle_autorun(self):
+        if self.is_in_restricted_period():
+            messagebox.showwarning("操作受限", "当前处于或即将进入监督时段，无法修改开机自启动！")
+            return
+        
+        key_path = r"Software\Microsoft\Windows\CurrentVersion\Run"
+        try:
+            import winreg
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_SET_VALUE)
+            if self.is_autorun_enabled():
+                winreg.DeleteValue(key, "SupervisorApp")
+            else:
+                exe_path = os.path.abspath(sys.executable)
+                script_path = self.script_path
+                winreg.SetValueEx(
+                    key, "SupervisorApp", 0, winreg.REG_SZ,
+                    f'"{exe_path}" "{script_path}"'
+                )
+            winreg.CloseKey(key)
+        except Exception as e:
+            messagebox.showerror("错误", f"注册表操作失败: {str(e)}")
+
+    def show_force_alert(self, item):
+        alert = Toplevel()
+        alert.attributes("-topmost", True)
+        alert.protocol("WM_DELETE_WINDOW", lambda: None)
+        alert.geometry("400x200+500+300")
+        alert.after(ALERT_DURATION * 1000, alert.destroy)
+        Frame(alert, bg="#f0f0f0").pack(fill=BOTH, expand=True)
+        Label(alert, text="\n自律监督提醒\n", font=("微软雅黑", 14), bg="#f0f0f0").pack()
+        Label(alert, 
+             text=f"当前处于监督时段：{item['name']}\n{item['start']} - {item['end']}",
+             bg="#f0f0f0").pack()
+        Label(alert, 
+             text=random.choice([
+                 "坚持就是胜利！", "未来属于自律的人！",
+                 "成功需要持之以恒！", "今日的付出是明日的收获！"
+             ]), bg="#f0f0f0").pack(pady=10)
+        Button(alert, text="我知道了", command=alert.destroy).pack(pady=5)
+
+    def show_usage_panel(self):
+        usage_win = self.create_window("使用统计", "520x480")
+        usage = self.engine.usage
+        today = date.today()
+        week = UsageLog.week_range(today)
+
+        ttk.Label(usage_win, text="应用使用时长", font=("微软雅黑", 12)).pack(pady=5)
+        self.fill_usage_table(usage_win, "应用", usage.app_totals(today, today), usage.app_totals(*week),
+                              lambda app: app)
+        ttk.Label(usage_win, text="按监督时段统计", font=("微软雅黑", 12)).pack(pady=5)
+        self.fill_usage_table(usage_win, "监督时段", usage.item_totals(today, today), usage.item_totals(*week),
+                              lambda key: "{} {}-{}".format(*key.split('|')[:3]) if key else "时段外")
+
+    def fill_usage_table(self, parent, heading, today, week, label):
+        frame = ttk.Frame(parent)
+        frame.pack(fill=BOTH, expand=True, padx=10)
+        tree = ttk.Treeview(frame, columns=('name', 'today', 'week'), show='headings', height=8)
+        for column, text in (('name', heading), ('today', "今日"), ('week', "本周")):
+            tree.heading(column, text=text)
+        tree.column('today', width=90, stretch=False, anchor=CENTER)
+        tree.column('week', width=90, stretch=False, anchor=CENTER)
+        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        for key in sorted(week, key=week.get, reverse=True):
+            tree.insert('', END, values=(label(key), self.format_duration(today.get(key, 0)),
+                                         self.format_duration(week[key])))
+
+    @staticmethod
+    def format_duration(seconds):
+        hours, minutes = divmod(int(seconds) // 60, 60)
+        return f"{hours}小时{minutes:02d}分" if hours else f"{minutes}分"
+
+    def show_audit_panel(self):
+        audit_win = self.create_window("操作记录", "680x420")
+        frame = ttk.Frame(audit_win)
+        frame.pack(fill=BOTH, expand=True, padx=10, pady=5)
+        tree = ttk.Treeview(frame, columns=('time', 'kind', 'detail'), show='headings', height=15)
+        for column, text, width in (('time', "时间", 140), ('kind', "类型", 80)):
+            tree.heading(column, text=text)
+            tree.column(column, width=width, stretch=False)
+        tree.heading('detail', text="详情")
+        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+
+        # 审计日志按游标分页读取：newer 保存翻过的页，便于原路返回
+        newer = []
+        current = {'cursor': None, 'next': None}
+
+        def show(cursor):
+            events, next_cursor = self.engine.audit.page(cursor)
+            tree.delete(*tree.get_children())
+            for event in events:
+                tree.insert('', END, values=(
+                    datetime.fromtimestamp(event.get('ts', 0)).strftime("%Y-%m-%d %H:%M:%S"),
+                    AUDIT_KIND_NAMES.get(event.get('kind'), event.get('kind')),
+                    self.describe_audit_event(event)
+                ))
+            current['cursor'], current['next'] = cursor, next_cursor
+
+        def show_latest():
+            newer.clear()
+            show(None)
+
+        def show_older():
+            if current['next'] is not None:
+                newer.append(current['cursor'])
+                show(current['next'])
+
+        def show_newer():
+            if newer:
+                show(newer.pop())
+
+        def jump():
+            try:
+                day = datetime.strptime(date_entry.get().strip(), "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("错误", "日期格式应为YYYY-MM-DD")
+                return
+            newer.clear()
+            show(self.engine.audit.seek((day + timedelta(days=1)).timestamp()))
+
+        btn_frame = ttk.Frame(audit_win)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="最新", command=show_latest).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="较新", command=show_newer).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="较早", command=show_older).pack(side=LEFT, padx=5)
+        date_entry = ttk.Entry(btn_frame, width=12)
+        date_entry.insert(0, date.today().isoformat())
+        date_entry.pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="跳转到该日", command=jump).pack(side=LEFT, padx=5)
+        show(None)
+
+    @staticmethod
+    def describe_audit_event(event):
+        kind = event.get('kind')
+        if kind == 'kill':
+            return f"{event.get('name')}（规则 {event.get('rule')}，共 {event.get('processes', 1)} 个进程）"
+        if kind == 'action':
+            return f"{event.get('item')} {event.get('start')}-{event.get('end')} 执行「{event.get('action')}」"
+        if kind == 'config':
+            return "；".join(f"{label}: {', '.join(name.split('|')[0] for name in event[key])}"
+                            for key, label in AUDIT_CONFIG_LABELS.items() if event.get(key))
+        if kind == 'restart':
+            return "守护进程被重新拉起" if event.get('target') == 'guardian' else "主程序被守护进程重新拉起"
+        if kind == 'hosts':
+            count = event.get('domains', 0)
+            return f"hosts 屏蔽 {count} 个域名" if count else "已解除 hosts 网站屏蔽"
+        return ""
+
+    def show_alert(self, title, message):
+        alert = Toplevel()
+        alert.title(title)
+        Label(alert, text=message).pack(padx=20, pady=10)
+        Button(alert, text="确定", command=alert.destroy).pack(pady=5)
+
+    def show_control_panel(self):
+        panel = self.create_window("控制面板", "600x400")
+
+        ttk.Label(panel, text="监督时段管理", font=("微软雅黑", 12)).pack(pady=5)
+        self.supervision_view = ChecklistView(panel, self.toggle_item, self.edit_item)
+        btn_frame = ttk.Frame(panel)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="添加监督时段", command=self.add_supervision_item).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="编辑", command=lambda: self.supervision_view.with_selection(self.edit_item)).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="删除", command=lambda: self.supervision_view.with_selection(self.delete_item)).pack(side=LEFT, padx=5)
+        self.refresh_supervision_list()
+
+        ttk.Label(panel, text="全局黑名单", font=("微软雅黑", 12)).pack(pady=5)
+        self.global_blacklist_view = ChecklistView(panel, self.toggle_global_blacklist)
+        btn_frame = ttk.Frame(panel)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="添加全局黑名单进程", command=self.add_global_blacklist_process).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="删除", command=lambda: self.global_blacklist_view.with_selection(self.delete_global_blacklist_process)).pack(side=LEFT, padx=5)
+        self.refresh_global_blacklist()
+
+    def check_new_item_conflict(self, new_item):
+        try:
+            new_start = parse_clock(new_item['start'])
+            new_end = parse_clock(new_item['end'])
+            return new_start <= seconds_of_day(self.engine.clock.now()) <= new_end
+        except:
+            return False
+
+    def is_item_restricted(self, item):
+        if not item['active']:
+            return False
+        return self.engine.is_item_restricted(item, self.engine.clock.now())
+
+    def add_supervision_item(self):
+        add_win = self.create_window("添加监督时段")
+        
+        ttk.Label(add_win, text="事项名称:").grid(row=0, column=0, padx=5, pady=5)
+        name_entry = ttk.Entry(add_win)
+        name_entry.grid(row=0, column=1)
+
+        ttk.Label(add_win, text="开始时间 (HH:MM):").grid(row=1, column=0)
+        start_entry = ttk.Entry(add_win)
+        start_entry.grid(row=1, column=1)
+
+        ttk.Label(add_win, text="结束时间 (HH:MM):").grid(row=2, column=0)
+        end_entry = ttk.Entry(add_win)
+        end_entry.grid(row=2, column=1)
+
+        ttk.Label(add_win, text="执行操作:").grid(row=3, column=0)
+        action_var = StringVar()
+        ttk.Combobox(add_win, textvariable=action_var, values=["关机", "锁定", "提醒", "仅启用黑名单（不弹窗）"]).grid(row=3, column=1)
+
+        enable_blacklist_var = BooleanVar(value=False)
+        ttk.Checkbutton(add_win, text="启用独立黑名单", variable=enable_blacklist_var).grid(row=4, columnspan=2, pady=5)
+
+        ttk.Label(add_win, text="重复间隔（分钟，0为不重复）:").grid(row=5, column=0)
+        repeat_entry = ttk.Entry(add_win)
+        repeat_entry.insert(0, "0")
+        repeat_entry.grid(row=5, column=1)
+
+        def save():
+            if not all([name_entry.get(), start_entry.get(), end_entry.get(), action_var.get()]):
+                messagebox.showerror("错误", "请填写所有字段")
+                return
+
+            repeat_interval = self.parse_repeat_interval(repeat_entry.get())
+            if repeat_interval is None:
+                return
+
+            try:
+                start = datetime.strptime(start_entry.get(), "%H:%M").time()
+                end = datetime.strptime(end_entry.get(), "%H:%M").time()
+                if start >= end:
+                    messagebox.showerror("错误", "结束时间必须晚于开始时间")
+                    return
+            except ValueError:
+                messagebox.showerror("错误", "时间格式应为HH:MM")
+                return
+
+            new_item = {
+                "name": name_entry.get(),
+                "start": start_entry.get(),
+                "end": end_entry.get(),
+                "action": action_var.get(),
+                "enable_blacklist": enable_blacklist_var.get(),
+                "blacklist": [],
+                "domains": [],
+                "repeat_interval": repeat_interval,
+                "active": True
+            }
+            
+            if self.check_new_item_conflict(new_item):
+                if not messagebox.askyesno("时间冲突", "当前正处于新设定的监督时段内！\n确定要立即启用该规则吗？"):
+                    return
+
+            self.supervision_items.append(new_item)
+            self.save_config()
+            add_win.destroy()
+            self.refresh_supervision_list()
+
+        ttk.Button(add_win, text="保存", command=save).grid(row=6, columnspan=2, pady=10)
+
+    def parse_repeat_interval(self, text):
+        try:
+            value = int(text.strip() or 0)
+            if value < 0:
+                raise ValueError
+            return value
+        except ValueError:
+            messagebox.showerror("错误", "重复间隔应为不小于0的整数")
+            return None
+
+    def refresh_supervision_list(self):
+        if self.supervision_view is None or not self.supervision_view.exists():
+            return
+        locked = self.engine.restricted_keys(self.engine.clock.now())
+        self.supervision_view.update([
+            (item['active'], f"{item['name']} {item['start']}-{item['end']}", ActionTracker.item_key(item) in locked)
+            for item in self.supervision_items
+        ])
+
+    def toggle_item(self, index):
+        item = self.supervision_items[index]
+        if self.is_item_restricted(item):
+            messagebox.showwarning("操作受限", "该监督时段处于执行期或准备期（前30分钟）\n无法修改状态！")
+            return
+            
+        self.supervision_items[index]['active'] = not item['active']
+        self.save_config()
+        self.refresh_supervision_list()
+
+    def edit_item(self, index):
+        item = self.supervision_items[index]
+        if self.is_item_restricted(item):
+            messagebox.showwarning("操作受限", "该监督时段处于执行期或准备期（前30分钟）\n无法编辑！")
+            return
+
+        edit_win = self.create_window("编辑监督时段")
+        
+        ttk.Label(edit_win, text="事项名称:").grid(row=0, column=0, padx=5, pady=5)
+        name_entry = ttk.Entry(edit_win)
+        name_entry.insert(0, item['name'])
+        name_entry.grid(row=0, column=1)
+
+        ttk.Label(edit_win, text="开始时间 (HH:MM):").grid(row=1, column=0)
+        start_entry = ttk.Entry(edit_win)
+        start_entry.insert(0, item['start'])
+        start_entry.grid(row=1, column=1)
+
+        ttk.Label(edit_win, text="结束时间 (HH:MM):").grid(row=2, column=0)
+        end_entry = ttk.Entry(edit_win)
+        end_entry.insert(0, item['end'])
+        end_entry.grid(row=2, column=1)
+
+        action_var = StringVar(value=item['action'])
+        ttk.Combobox(edit_win, textvariable=action_var, values=["关机", "锁定", "提醒", "仅启用黑名单（不弹窗）"]).grid(row=3, column=1)
+
+        enable_blacklist_var = BooleanVar(value=item.get('enable_blacklist', False))
+        ttk.Checkbutton(edit_win, text="启用独立黑名单", variable=enable_blacklist_var).grid(row=4, columnspan=2, pady=5)
+
+        ttk.Button(edit_win, text="管理独立黑名单", command=lambda: self.manage_blacklist(item, edit_win)).grid(row=5, column=0, pady=5)
+        ttk.Button(edit_win, text="管理屏蔽网站", command=lambda: self.manage_domains(item, edit_win)).grid(row=5, column=1, pady=5)
+
+        ttk.Label(edit_win, text="重复间隔（分钟，0为不重复）:").grid(row=6, column=0)
+        repeat_entry = ttk.Entry(edit_win)
+        repeat_entry.insert(0, str(item.get('repeat_interval', 0)))
+        repeat_entry.grid(row=6, column=1)
+
+        def save():
+            if not all([name_entry.get(), start_entry.get(), end_entry.get(), action_var.get()]):
+                messagebox.showerror("错误", "请填写所有字段")
+                return
+
+            repeat_interval = self.parse_repeat_interval(repeat_entry.get())
+            if repeat_interval is None:
+                return
+
+            try:
+                start = datetime.strptime(start_entry.get(), "%H:%M").time()
+                end = datetime.strptime(end_entry.get(), "%H:%M").time()
+                if start >= end:
+                    messagebox.showerror("错误", "结束时间必须晚于开始时间")
+                    return
+            except ValueError:
+                messagebox.showerror("错误", "时间格式应为HH:MM")
+                return
+
+            new_item = {
+                "name": name_entry.get(),
+                "start": start_entry.get(),
+                "end": end_entry.get(),
+                "action": action_var.get(),
+                "enable_blacklist": enable_blacklist_var.get(),
+                "blacklist": item.get('blacklist', []),
+                "domains": item.get('domains', []),
+                "repeat_interval": repeat_interval,
+                "active": item['active']
+            }
+
+            if self.check_new_item_conflict(new_item):
+                if not messagebox.askyesno("时间冲突", "当前正处于新设定的监督时段内！\n确定要立即启用该规则吗？"):
+                    return
+
+            self.supervision_items[index] = new_item
+            self.save_config()
+            edit_win.destroy()
+            self.refresh_supervision_list()
+
+        ttk.Button(edit_win, text="保存", command=save).grid(row=7, columnspan=2, pady=10)
+
+    def manage_blacklist(self, item, parent_window):
+        blacklist_win = self.create_window("管理独立黑名单", "400x300", parent_window)
+
+        def refresh_blacklist():
+            if blacklist_view.exists():
+                blacklist_view.update([(proc['active'], proc['name'], False) for proc in item.get('blacklist', [])])
+
+        ttk.Label(blacklist_win, text="独立黑名单进程", font=("微软雅黑", 12)).pack(pady=5)
+        blacklist_view = ChecklistView(blacklist_win, lambda i: self.toggle_blacklist_item(item, i, refresh_blacklist))
+
+        refresh_blacklist()
+
+        btn_frame = ttk.Frame(blacklist_win)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="添加进程", command=lambda: self.add_blacklist_item(item, refresh_blacklist)).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="删除", command=lambda: blacklist_view.with_selection(
+            lambda i: self.delete_blacklist_item(item, i, refresh_blacklist))).pack(side=LEFT, padx=5)
+
+    def manage_domains(self, item, parent_window):
+        # 域名列表可能有十万条，用 Listbox 一次性插入，不做逐行勾选
+        domain_win = self.create_window("管理屏蔽网站", "420x360", parent_window)
+        count_var = StringVar()
+        ttk.Label(domain_win, textvariable=count_var, font=("微软雅黑", 12)).pack(pady=5)
+        frame = ttk.Frame(domain_win)
+        frame.pack(fill=BOTH, expand=True, padx=10)
+        domain_list = Listbox(frame, selectmode='extended', activestyle='none')
+        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL, command=domain_list.yview)
+        domain_list.configure(yscrollcommand=scrollbar.set)
+        domain_list.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+
+        def refresh_domains():
+            domains = item.setdefault('domains', [])
+            domain_list.delete(0, END)
+            domain_list.insert(END, *domains)
+            count_var.set(f"执行期内屏蔽的网站（{len(domains)} 个）")
+
+        def merge(text):
+            domains = item.setdefault('domains', [])
+            known = set(domains)
+            added = [domain for domain in dict.fromkeys(parse_domain_list(text)) if domain not in known]
+            if added:
+                domains.extend(added)
+                self.save_config()
+                refresh_domains()
+            return len(added)
+
+        def add_domains():
+            text = simpledialog.askstring("添加网站", DOMAIN_PROMPT, parent=domain_win)
+            if text and not merge(text):
+                messagebox.showinfo("提示", "没有新的有效域名", parent=domain_win)
+
+        def import_domains():
+            path = filedialog.askopenfilename(parent=domain_win, title="导入域名列表",
+                                              filetypes=[("文本文件", "*.txt"), ("hosts 文件", "hosts"), ("所有文件", "*.*")])
+            if not path:
+                return
+            try:
+                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                    added = merge(f.read())
+            except OSError as e:
+                messagebox.showerror("错误", f"读取文件失败: {str(e)}", parent=domain_win)
+                return
+            messagebox.showinfo("导入完成", f"新增 {added} 个域名", parent=domain_win)
+
+        def delete_domains():
+            selection = set(domain_list.curselection())
+            if not selection:
+                messagebox.showinfo("提示", "请先选择一项", parent=domain_win)
+                return
+            item['domains'] = [domain for index, domain in enumerate(item['domains']) if index not in selection]
+            self.save_config()
+            refresh_domains()
+
+        def clear_domains():
+            if item.get('domains') and messagebox.askyesno("确认清空", "确定要清空全部屏蔽网站吗？", parent=domain_win):
+                item['domains'] = []
+                self.save_config()
+                refresh_domains()
+
+        refresh_domains()
+        btn_frame = ttk.Frame(domain_win)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="添加网站", command=add_domains).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="从文件导入", command=import_domains).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="删除", command=delete_domains).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="清空", command=clear_domains).pack(side=LEFT, padx=5)
+
+    def add_blacklist_item(self, item, refresh_callback):
+        proc = simpledialog.askstring("添加进程", BLACKLIST_PROMPT)
+        if proc and proc not in [item['name'] for item in item.get('blacklist', [])]:
+            item['blacklist'].append({"name": proc, "active": True})
+            self.save_config()
+            refresh_callback()
+
+    def toggle_blacklist_item(self, item, index, refresh_callback):
+        item['blacklist'][index]['active'] = not item['blacklist'][index]['active']
+        self.save_config()
+        refresh_callback()
+
+    def delete_blacklist_item(self, item, index, refresh_callback):
+        if messagebox.askyesno("确认删除", "确定要删除这个进程吗？"):
+            del item['blacklist'][index]
+            self.save_config()
+            refresh_callback()
+
+    def delete_item(self, index):
+        item = self.supervision_items[index]
+        if self.is_item_restricted(item):
+            messagebox.showwarning("操作受限", "该监督时段处于执行期或准备期（前30分钟）\n无法删除！")
+            return
+            
+        if messagebox.askyesno("确认删除", "确定要删除这个监督时段吗？"):
+            del self.supervision_items[index]
+            self.save_config()
+            self.refresh_supervision_list()
+
+    def add_global_blacklist_process(self):
+        proc = simpledialog.askstring("添加进程", BLACKLIST_PROMPT)
+        if proc and proc not in [item['name'] for item in self.global_blacklist]:
+            self.global_blacklist.append({"name": proc, "active": True})
+            self.save_config()
+            self.refresh_global_blacklist()
+
+    def refresh_global_blacklist(self):
+        if self.global_blacklist_view is None or not self.global_blacklist_view.exists():
+            return
+        is_locked = self.is_in_restricted_period()
+        self.global_blacklist_view.update([(proc['active'], proc['name'], is_locked) for proc in self.global_blacklist])
+
+    def toggle_global_blacklist(self, index):
+        if self.is_in_restricted_period():
+            messagebox.showwarning("操作受限", "当前处于或即将进入监督时段，无法修改黑名单状态！")
+            return
+            
+        self.global_blacklist[index]['active'] = not self.global_blacklist[index]['active']
+        self.save_config()
+        self.refresh_global_blacklist()
+
+    def delete_global_blacklist_process(self, index):
+        if self.is_in_restricted_period():
+            messagebox.showwarning("操作受限", "当前处于或即将进入监督时段，无法删除黑名单进程！")
+            return
+        if messagebox.askyesno("确认删除", "确定要删除这个进程吗？"):
+            del self.global_blacklist[index]
+            self.save_config()
+            self.refresh_global_blacklist()
+
+    def is_in_restricted_period(self, check_time=None):
+        now = self.engine.clock.now() if check_time is None else check_time
+        return self.engine.is_restricted(now)
+
+    def check_restricted_operation(self, operation_type):
+        if self.is_in_restricted_period():
+            msg = f"当前处于或即将进入监督时段，无法{operation_type}！"
+            messagebox.showwarning("操作受限", msg)
+            return True
+        return False
+
+    def quit_app(self):
+        if self.check_restricted_operation("退出"):
+            return
+        try:
+            os.remove(self.instance_lock)
+        except:
+            pass
+        self.engine.stop()
+        self.tomato.flush()
+        self.save_window_positions()
+        self.tray_icon.stop()
+        self.root.destroy()
+        os._exit(0)
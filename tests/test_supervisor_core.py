@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+import fnmatch
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("psutil")
+
+import supervisor_core as core
+from simulator import SimulatedClock
+
+DAY = datetime(2026, 10, 19)
+
+def make_item(name, start, end, action='提醒', active=True, **extra):
+    return dict(name=name, start=start, end=end, action=action, active=active, blacklist=[], **extra)
+
+def at(hour, minute=0, second=0, day=DAY):
+    return day.replace(hour=hour, minute=minute, second=second)
+
+class TickingClock(SimulatedClock):
+    # 每次取时间前进一秒，审计事件的时间戳严格递增
+    def time(self):
+        self.timestamp += 1
+        return self.timestamp
+
+# ScheduleIndex
+
+def test_schedule_phases_follow_grace_period():
+    item = make_item('夜间', '22:00', '23:00')
+    schedule = core.ScheduleIndex([item])
+    grace_start = at(22) - timedelta(minutes=core.GRACE_PERIOD)
+    assert schedule.phase(item, grace_start - timedelta(seconds=1)) == 'pending'
+    assert schedule.phase(item, grace_start) == 'grace'
+    assert schedule.phase(item, at(22, 30)) == 'active'
+    assert schedule.phase(item, at(23)) == 'active'
+    assert schedule.phase(item, at(23, 0, 1)) == 'ended'
+    assert not schedule.is_restricted(grace_start - timedelta(seconds=1))
+    assert schedule.is_restricted(grace_start)
+    assert schedule.active_items(at(22, 30)) == (item,)
+
+def test_schedule_grace_wraps_past_midnight():
+    item = make_item('凌晨', '00:10', '01:00')
+    schedule = core.ScheduleIndex([item])
+    assert schedule.phase(item, at(23, 50)) == 'grace'
+    assert schedule.phase(item, at(0, 5)) == 'grace'
+    assert schedule.phase(item, at(0, 30)) == 'active'
+    assert not schedule.is_restricted(at(23, 30))
+
+def test_schedule_skips_inactive_and_invalid_items():
+    inactive = make_item('停用', '10:00', '11:00', active=False)
+    broken = make_item('无效', '25:99', '11:00')
+    reversed_item = make_item('倒置', '11:00', '10:00')
+    schedule = core.ScheduleIndex([inactive, broken, reversed_item])
+    assert schedule.phase(inactive, at(10, 30)) is None
+    assert not schedule.is_restricted(at(10, 30))
+    assert schedule.seconds_until_boundary(at(10, 30)) is None
+
+def test_schedule_overlapping_items_keep_config_order():
+    first = make_item('一', '20:00', '22:00')
+    second = make_item('二', '21:00', '23:00')
+    schedule = core.ScheduleIndex([first, second])
+    assert schedule.active_items(at(21, 30)) == (first, second)
+    assert schedule.active_items(at(22, 30)) == (second,)
+
+def test_schedule_seconds_until_boundary():
+    schedule = core.ScheduleIndex([make_item('夜间', '22:00', '23:00')])
+    assert schedule.seconds_until_boundary(at(21)) == 30 * 60
+    assert schedule.seconds_until_boundary(at(21, 30)) == 30 * 60
+    # 最后一个边界之后等到次日第一个边界（21:30 准备期开始）
+    assert schedule.seconds_until_boundary(at(23, 30)) == 22 * 3600
+
+# BlacklistMatcher
+
+def entry(name, active=True):
+    return {'name': name, 'active': active}
+
+def test_matcher_exact_glob_and_regex():
+    matcher = core.BlacklistMatcher([entry('Chrome.exe'), entry('*game*.exe'), entry(r're:steam\d*\.exe'),
+                                     entry('taskmgr.exe', active=False)])
+    assert matcher.matches('chrome.exe')
+    assert matcher.matches('CHROME.EXE')
+    assert matcher.matches('mygamelauncher.exe')
+    assert matcher.matches('Steam64.exe')
+    assert not matcher.matches('steamwebhelper.exe')
+    assert not matcher.matches('taskmgr.exe')
+    assert not matcher.matches('chrome.exe.bak')
+    assert matcher.rule_for('CHROME.exe') == 'chrome.exe'
+    assert matcher.rule_for('game.exe') == '*game*.exe'
+    assert matcher.rule_for('steam.exe') == r're:steam\d*\.exe'
+
+def test_matcher_empty_and_invalid_entries():
+    assert not core.BlacklistMatcher([])
+    assert not core.BlacklistMatcher([entry('re:(unclosed'), entry('sha256:1234'), entry('', active=True)])
+
+def test_matcher_regex_with_groups_is_kept_separate():
+    matcher = core.BlacklistMatcher([entry(r're:(ab)\1\.exe')])
+    assert matcher.separate
+    assert matcher.matches('abab.exe')
+    assert not matcher.matches('ab.exe')
+
+def test_matcher_gram_index_agrees_with_fnmatch():
+    rules = [f"*tool{i}*.exe" for i in range(40)] + ["*.tmp.exe", "x?y.exe"]
+    matcher = core.BlacklistMatcher([entry(rule) for rule in rules])
+    assert matcher.grams
+    names = [f"{prefix}tool{i}{suffix}" for prefix, i, suffix in
+             itertools.product(('', 'my', 'TOOL'), range(0, 50, 3), ('.exe', '-x.exe', '.dll'))]
+    names += ['a.tmp.exe', 'xzy.exe', 'xy.exe', 'notes.txt']
+    for name in names:
+        expected = any(fnmatch.fnmatchcase(name.lower(), rule) for rule in rules)
+        assert matcher.matches(name) == expected, name
+
+def test_matcher_identity_rules():
+    digest = 'ab' * 32
+    matcher = core.BlacklistMatcher([entry(f'sha256:{digest.upper()}'), entry('publisher: Valve Corp')])
+    assert matcher and matcher.by_identity
+    assert not matcher.matches('steam.exe')
+    assert matcher.identity_rule(core.ExeIdentity(digest, None)) == f'sha256:{digest.upper()}'
+    assert matcher.identity_rule(core.ExeIdentity('0' * 64, 'VALVE CORP')) == 'publisher: Valve Corp'
+    assert matcher.identity_rule(core.ExeIdentity('0' * 64, 'Other')) is None
+
+# ActionTracker
+
+@pytest.fixture
+def tracker_factory(tmp_path):
+    clock = SimulatedClock(at(21))
+
+    def create():
+        return core.ActionTracker(str(tmp_path / 'state.json'), clock)
+    return create
+
+def test_tracker_fires_once_per_day(tracker_factory):
+    tracker = tracker_factory()
+    item = make_item('夜间', '22:00', '23:00')
+    assert not tracker.advance(item, 'grace', at(21, 45))
+    assert tracker.advance(item, 'active', at(22))
+    tracker.mark_fired(item, at(22))
+    assert not tracker.advance(item, 'active', at(22, 10))
+    assert tracker.advance(item, 'active', at(22, day=DAY + timedelta(days=1)))
+
+def test_tracker_repeat_interval(tracker_factory):
+    tracker = tracker_factory()
+    item = make_item('夜间', '22:00', '23:00', repeat_interval=15)
+    tracker.advance(item, 'active', at(22))
+    tracker.mark_fired(item, at(22))
+    assert tracker.seconds_until_repeat([item], at(22, 5)) == 10 * 60
+    assert not tracker.advance(item, 'active', at(22, 14))
+    assert tracker.advance(item, 'active', at(22, 15))
+
+def test_tracker_state_survives_restart(tracker_factory):
+    tracker = tracker_factory()
+    item = make_item('夜间', '22:00', '23:00')
+    tracker.advance(item, 'active', at(22))
+    tracker.mark_fired(item, at(22))
+    tracker.flush()
+    restarted = tracker_factory()
+    assert restarted.record(item, at(22, 5))['state'] == 'fired'
+    assert not restarted.advance(item, 'active', at(22, 5))
+
+def test_tracker_refires_shutdown_after_reboot(tracker_factory):
+    tracker = tracker_factory()
+    shutdown = make_item('关机', '22:00', '23:00', action='关机')
+    tracker.advance(shutdown, 'active', at(22))
+    tracker.mark_fired(shutdown, at(22))
+    tracker.session_start = at(22).timestamp() - 1
+    assert not tracker.advance(shutdown, 'active', at(22, 5))
+    tracker.session_start = at(22, 3).timestamp()
+    assert tracker.advance(shutdown, 'active', at(22, 5))
+
+# HostsFileBlocker
+
+def test_hosts_block_round_trip(tmp_path):
+    path = tmp_path / 'hosts'
+    original = b"127.0.0.1 localhost\r\n# keep me\r\n"
+    path.write_bytes(original)
+    blocker = core.HostsFileBlocker(str(path))
+    domains = [f"site{i}.com" for i in range(core.HOSTS_NAMES_PER_LINE + 1)]
+    assert blocker.apply(domains)
+    text = path.read_bytes().decode()
+    assert text.startswith("127.0.0.1 localhost\r\n# keep me\r\n" + core.HOSTS_BEGIN)
+    assert '\n' not in text.replace('\r\n', '')
+    assert text.count(core.HOSTS_ADDRESS) == 2
+    assert all(domain in text for domain in domains)
+    assert not blocker.apply(domains)
+    # 新实例发现文件中已是同样的托管段，不重复写盘
+    assert not core.HostsFileBlocker(str(path)).apply(domains)
+    assert blocker.apply([])
+    assert path.read_bytes() == original
+
+def test_hosts_block_replaces_previous_block(tmp_path):
+    path = tmp_path / 'hosts'
+    blocker = core.HostsFileBlocker(str(path))
+    assert blocker.apply(['a.com'])
+    path.write_text(path.read_text() + "10.0.0.1 added.later\n")
+    assert blocker.apply(['b.com'])
+    text = path.read_text()
+    assert 'a.com' not in text and 'b.com' in text
+    assert text.endswith("10.0.0.1 added.later\n")
+    assert text.count(core.HOSTS_BEGIN) == 1
+
+def test_parse_domain_list_accepts_hosts_lines():
+    assert core.parse_domain_list("0.0.0.0 a.com b.com # note\nhttps://Example.COM/path\n") == \
+        ['a.com', 'b.com', 'example.com']
+
+# AuditLog
+
+@pytest.fixture
+def audit(tmp_path, monkeypatch):
+    # 小分段、密索引，让翻页跨越索引块与分段
+    monkeypatch.setattr(core, 'AUDIT_INDEX_BYTES', 256)
+    clock = TickingClock(at(12))
+    log = core.AuditLog(str(tmp_path / 'audit'), max_bytes=2048, max_files=100, clock=clock).start()
+    for number in range(120):
+        log.record('kill', target=f'app{number}.exe', number=number)
+    log.flush()
+    return log
+
+def test_audit_page_walks_newest_to_oldest(audit):
+    assert len(audit.segments()) > 1
+    numbers = []
+    cursor = None
+    while True:
+        events, cursor = audit.page(cursor, limit=7)
+        assert len(events) <= 7
+        numbers.extend(event['number'] for event in events)
+        if cursor is None:
+            break
+    assert numbers == list(range(119, -1, -1))
+
+def test_audit_seek_positions_page(audit):
+    events, _ = audit.page(limit=200)
+    by_number = {event['number']: event['ts'] for event in events}
+    events, _ = audit.page(audit.seek(by_number[50]), limit=5)
+    assert [event['number'] for event in events] == [50, 49, 48, 47, 46]
+    events, _ = audit.page(audit.seek(by_number[0] - 10), limit=5)
+    assert events == []
+    events, _ = audit.page(audit.seek(by_number[119] + 10), limit=1)
+    assert [event['number'] for event in events] == [119]
+
+# UsageLog
+
+def test_usage_totals_span_rolled_up_days_and_today(tmp_path):
+    clock = SimulatedClock(at(12))
+    usage = core.UsageLog(str(tmp_path / 'usage'), interval=5, clock=clock).open()
+    samples = [(DAY - timedelta(days=2), 'code.exe', '', 3),
+               (DAY - timedelta(days=1), 'code.exe', '夜间', 2),
+               (DAY - timedelta(days=1), 'game.exe', '', 4),
+               (DAY, 'code.exe', '', 5)]
+    for day, app, item, count in samples:
+        for second in range(count):
+            usage.append(at(10, 0, second, day=day).timestamp(), app, item)
+    assert usage.totals(DAY.date(), DAY.date()) == {('code.exe', ''): 25}
+    assert usage.totals((DAY - timedelta(days=1)).date(), (DAY - timedelta(days=1)).date()) == \
+        {('code.exe', '夜间'): 10, ('game.exe', ''): 20}
+    week = usage.totals((DAY - timedelta(days=6)).date(), DAY.date())
+    assert week == {('code.exe', ''): 40, ('code.exe', '夜间'): 10, ('game.exe', ''): 20}
+    assert usage.app_totals((DAY - timedelta(days=6)).date(), DAY.date()) == {'code.exe': 50, 'game.exe': 20}
+    assert usage.item_totals((DAY - timedelta(days=6)).date(), DAY.date()) == {'': 60, '夜间': 10}
+    usage.close()
+    reopened = core.UsageLog(str(tmp_path / 'usage'), interval=5, clock=clock).open()
+    assert reopened.totals((DAY - timedelta(days=6)).date(), DAY.date()) == week
+    reopened.close()
+
+def test_usage_totals_empty(tmp_path):
+    usage = core.UsageLog(str(tmp_path / 'usage'), clock=SimulatedClock(at(12)))
+    assert usage.totals(DAY.date(), DAY.date()) == {}
+    usage.open()
+    assert usage.totals(DAY.date(), DAY.date()) == {}
+    usage.close()